@@ -0,0 +1,56 @@
+#
+# BenchCircFit.py : compare the circle fitting engines of EstimateCurve,
+#                   CircFit.FitCircRANSAC2D vs. pyransac3d, for speed and accuracy
+#                   on synthetic noisy arcs with lead-in/lead-out straights.
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from CircFit import FitCircRANSAC2D
+
+def SynthRoad( RADIUS, DELTA_DEG, LEAD, DIV=0.5, NOISE=0.05, SEED=0 ):
+    ''' straight-arc-straight centerline sampled every DIV m, UTM-like offset ,
+        return xy (N,2), true center (2,) '''
+    rng = np.random.default_rng( SEED )
+    delta = np.radians( DELTA_DEG )
+    s_in  = np.arange( -LEAD, 0, DIV )
+    lead_in = np.column_stack( [ s_in, np.full_like(s_in,0.) ] )
+    th = np.arange( 0, RADIUS*delta, DIV )/RADIUS
+    arc = np.column_stack( [ RADIUS*np.sin(th), RADIUS*(1-np.cos(th)) ] )
+    s_out = np.arange( DIV, LEAD, DIV )
+    lead_out = arc[-1] + np.column_stack( [ s_out*np.cos(delta), s_out*np.sin(delta) ] )
+    xy = np.vstack( [lead_in, arc, lead_out] )
+    xy = xy + rng.normal( 0, NOISE, xy.shape ) + [680_000, 1_527_000]
+    return xy, np.array([680_000, 1_527_000+RADIUS])
+
+def Timing( func, *args, **kw ):
+    t0 = time.perf_counter()
+    res = func( *args, **kw )
+    return time.perf_counter()-t0, res
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description='benchmark circle fitting engines' )
+    parser.add_argument( '-r','--radius', type=float, nargs='+', default=[50,300,1200] )
+    parser.add_argument( '-d','--delta', type=float, default=90, help='arc delta in degree' )
+    parser.add_argument( '-l','--lead', type=float, default=30, help='lead-in/out length in m' )
+    parser.add_argument( '--repeat', type=int, default=3 )
+    args = parser.parse_args()
+    import pyransac3d as pyrsc      # optional , only this benchmark needs it
+    result = list()
+    for R in args.radius:
+        for rep in range( args.repeat ):
+            xy,center = SynthRoad( R, args.delta, args.lead, SEED=rep )
+            t2d,(c2d,r2d,in2d) = Timing( FitCircRANSAC2D, xy, thresh=0.2, SEED=rep )
+            t3d,(c3d,_,r3d,in3d) = Timing( pyrsc.Circle().fit,
+                        np.column_stack([xy,np.zeros(len(xy))]), thresh=0.2, maxIteration=1000 )
+            for name,t,c,r,inl in [ ('ransac2d',t2d,c2d,r2d,in2d),
+                                    ('pyransac3d',t3d,c3d[:2],r3d,in3d) ]:
+                result.append( [ R, rep, name, len(xy), t, abs(r-R),
+                                 np.hypot(*(c-center)), len(inl) ] )
+    df = pd.DataFrame( result, columns=['RADIUS','rep','method','npnt','time_s',
+                                        'err_radius_m','err_center_m','n_inlier'] )
+    print( df.groupby(['RADIUS','method'])[['npnt','time_s','err_radius_m','err_center_m',
+                        'n_inlier']].mean().to_markdown( floatfmt='.4f' ) )
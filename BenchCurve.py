@@ -0,0 +1,70 @@
+#
+# BenchCurve.py : time the point-on-curve generation of CircularCurve
+#                 ( GenNormArc + RotTransNormArc ) for 10^3 .. 10^6 points and
+#                 compare against the former row-wise DataFrame.apply path.
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely.geometry import LineString,Point
+from shapely.affinity import rotate
+from CurvePnts import CircularCurve
+
+ALIGN  = LineString( [ [0,0],[1000,0],[1000,1000] ] )  # PC-PI-PT, delta 90 deg
+RADIUS = 500
+
+def LegacyArc( cc ):
+    ''' former per-row implementation, kept here only as the timing reference '''
+    PAR = cc.PAR
+    ndiv,rest = divmod(PAR.LENCUR, PAR.DIV)
+    pnt_div = np.linspace(rest/2,PAR.LENCUR-rest/2,num=int(ndiv)+1,endpoint=True )
+    pnts = np.concatenate( [np.array([0]), pnt_div, np.array([PAR.LENCUR]) ] )
+    dfPNT = pd.DataFrame( pnts, columns=['cvDist'] )
+    def DoCurve(row, PAR):
+        theta = row.cvDist/PAR.RADIUS
+        x,y = PAR.RADIUS*np.sin(theta),PAR.RADIUS*np.cos(theta)
+        if PAR.sgDEFL<0.   : y=-y
+        if PAR.ROUND_ABOUT : x=-x
+        return [ f'{row.cvDist:03.0f}', f'{row.cvDist:.3f}', Point(x,y) ]
+    dfPNT[['Name','cvDist', 'geometry']] = dfPNT.apply( DoCurve,
+                              axis=1, result_type='expand', args=(PAR,) )
+    gdfPNT = gpd.GeoDataFrame( dfPNT, crs=PAR.EPSG, geometry=dfPNT.geometry )
+    p000  = gdfPNT.iloc[0].geometry
+    dx,dy = PAR.PC.x-p000.x, PAR.PC.y-p000.y
+    sgRot = np.arctan2( PAR.PI.y-PAR.PC.y, PAR.PI.x-PAR.PC.x )
+    def RotTr(row,dx,dy,sgRot,pntPC):
+        x_,y_ = row.geometry.x+dx , row.geometry.y+dy
+        return rotate( Point( x_,y_),sgRot, origin=(pntPC.x,pntPC.y), use_radians=True )
+    gdfPNT['geometry'] = gdfPNT.apply( RotTr, axis=1,
+                        result_type='expand', args=( dx,dy,sgRot,PAR.PC ) )
+    return gdfPNT
+
+def Timing( func, *args ):
+    t0 = time.perf_counter()
+    res = func( *args )
+    return time.perf_counter()-t0, res
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description='benchmark point-on-curve generation' )
+    parser.add_argument( '-n','--npnt', type=int, nargs='+', default=[10**3,10**4,10**5,10**6],
+                    help='number of points-on-curve to generate' )
+    parser.add_argument( '--legacy_max', type=int, default=10**5,
+                    help='largest size also timed with the legacy row-wise path' )
+    args = parser.parse_args()
+    LENCUR = RADIUS*np.pi/2
+    result = list()
+    for npnt in args.npnt:
+        DIV = LENCUR/npnt
+        t_vec,cc = Timing( CircularCurve, 32647, ALIGN, RADIUS, DIV )
+        t_leg = np.nan ; max_err = np.nan
+        if npnt<=args.legacy_max:
+            t_leg,gdfLeg = Timing( LegacyArc, cc )
+            max_err = shapely.distance( gdfLeg.geometry.values, cc.gdfPNT.geometry.values ).max()
+        result.append( [ len(cc.gdfPNT), t_vec, t_leg, t_leg/t_vec, max_err ] )
+    df = pd.DataFrame( result, columns=['npnt','vector_s','legacy_s','speedup','max_err_m'] )
+    print( df.to_markdown( floatfmt=('.0f','.4f','.4f','.1f','.2e'), index=False ) )
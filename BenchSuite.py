@@ -0,0 +1,217 @@
+#
+# BenchSuite.py : reproducible benchmarks of the hot paths on synthetic data ,
+#                 CircularCurve / CircularCurve.FromAlignments ( PC-PI-PT sweeps ) ,
+#                 HorAlignment ( whole routes of N PIs ) ,
+#                 EstimateCurve.FitCircRANSAC ( noisy centerlines ) ,
+#                 Section.MakeStation/MakeSection ( long routes ) and
+#                 CmpTrajectory.MakeDiff ( 200 Hz trajectories ) at several sizes .
+#                 One JSON line per case : time, throughput, peak memory, accuracy ;
+#                 --compare flags cases slower than a previous run .
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import sys
+import io
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import contextlib
+import numpy as np
+import pandas as pd
+import shapely
+from pathlib import Path
+from shapely.geometry import LineString
+from pyproj import Transformer
+from CurvePnts import CircularCurve
+from EstCurve import EstimateCurve
+from MakeRoadSect import Section
+from HorAlign import HorAlignment
+from BenchCircFit import SynthRoad, Timing
+from Trajectory.CompareTrj import CmpTrajectory
+
+EPSG = 32647
+E0,N0 = 660_000, 1_520_000    # UTM-like offset of all synthetic data
+
+###############################################################################
+def SweepAligns( NCURVE, LEN=5000 ):
+    ''' NCURVE PC-PI-PT alignments (N,3,2) sweeping deflection 10..350 deg
+        ( 180 excluded ) and radius 50..1200 m , as TestDeflec.py '''
+    defl = np.resize( np.setdiff1d( np.arange(10,360,10), [180] ), NCURVE )
+    radius = np.resize( [50.,300.,1200.], NCURVE )
+    th = np.radians( defl )
+    pc = np.tile( [E0,N0], (NCURVE,1) ).astype(float)
+    pi = pc + [LEN,0.]
+    pt = pi + LEN*np.column_stack( [ np.cos(th), np.sin(th) ] )
+    return np.stack( [pc,pi,pt], axis=1 ), radius
+
+def SynthPIs( NPI, SEED=0 ):
+    ''' BEGIN-PI1..PI(NPI)-END polyline of 600-900 m legs turning up to 34 deg ,
+        radius 200..500 m per PI , tangents never overlap '''
+    rng = np.random.default_rng( SEED )
+    az = np.cumsum( rng.uniform( -0.6,0.6, NPI+1 ) )
+    leg = rng.uniform( 600,900, NPI+1 )
+    xy = np.vstack( [ [0.,0.], np.cumsum( np.column_stack( [leg*np.cos(az),leg*np.sin(az)] ), axis=0 ) ] )
+    return xy+[E0,N0], rng.uniform( 200,500, NPI )
+
+def SynthRoute( LEN_KM, DIV=5. ):
+    ''' sinuous centerline over LEN_KM km of easting sampled every DIV m '''
+    s = np.arange( 0, LEN_KM*1000+DIV, DIV )
+    return LineString( np.column_stack( [ E0+s, N0+300*np.sin(s/700) ] ) )
+
+def SynthTrajectory( SECONDS, HZ=200, SPEED=60, OFFSET=0.05, DH=0.03 ):
+    ''' reference and test trajectory at HZ of a vehicle at SPEED km/h , test epochs
+        half an epoch later ( within the reference ) , OFFSET m to the left and DH m
+        higher than the reference ,
+        return REF ( as CmpTrajectory.MakeRefTrajectory ) , dfTEST '''
+    def Path_( t ):
+        s = (SPEED/3.6)*(t-t[0]+0.)
+        x,y = E0+s, N0+200*np.sin(s/500)
+        dx,dy = np.ones_like(s), 200/500*np.cos(s/500)
+        nrm = np.hypot( dx,dy )
+        return x,y, -dy/nrm, dx/nrm, 10+2*np.sin(s/300)
+    t_ref = 400_000 + np.arange( int(SECONDS*HZ) )/HZ
+    x,y,_,_,h = Path_( t_ref )
+    t_tst = t_ref[:-1] + 0.5/HZ
+    xt,yt,nx,ny,ht = Path_( np.append( t_ref[:1], t_tst ) )   # same origin of s
+    xt,yt,nx,ny,ht = [ v[1:] for v in (xt,yt,nx,ny,ht) ]
+    ToGEO = Transformer.from_crs( EPSG, 'EPSG:4326', always_xy=True )
+    lon,lat = ToGEO.transform( xt+OFFSET*nx, yt+OFFSET*ny )
+    REF = { 'UTM': f'EPSG:{EPSG}', 'WKB': shapely.to_wkb( LineString( np.column_stack([x,y]) ) ),
+            'GPSTime': t_ref, 'H-Ell': h }
+    dfTEST = pd.DataFrame( { 'GPSTime': t_tst, 'Latitude': lat, 'Longitude': lon,
+                             'H-Ell': ht+DH } )
+    return REF, dfTEST
+
+###############################################################################
+def BenchCircularCurve( NPNT ):
+    ALIGN = LineString( [ [E0,N0],[E0+1000,N0],[E0+1000,N0+1000] ] )
+    RADIUS = 500.
+    def Run():
+        with contextlib.redirect_stdout( io.StringIO() ):
+            return CircularCurve( EPSG, ALIGN, RADIUS, RADIUS*np.pi/2/NPNT )
+    def Accuracy( cc ):
+        xy = shapely.get_coordinates( cc.gdfPNT.geometry )
+        r = np.hypot( *(xy-cc.PAR.ORIGIN.coords[0]).T )
+        return { 'err_radius_m': np.abs(r-RADIUS).max() }
+    return Run, Accuracy, 'point', NPNT
+
+def BenchFromAlignments( NCURVE ):
+    ALIGNS,RADIUS = SweepAligns( NCURVE )
+    def Run():
+        return CircularCurve.FromAlignments( ALIGNS, RADIUS, 20. )
+    def Accuracy( res ):
+        dfPAR,gdfPNT = res
+        par = dfPAR.set_index('CURVE').loc[ gdfPNT.CURVE ]
+        xy = shapely.get_coordinates( gdfPNT.geometry )
+        r = np.hypot( xy[:,0]-par.ORIGIN_x.to_numpy(), xy[:,1]-par.ORIGIN_y.to_numpy() )
+        return { 'err_radius_m': np.abs( r-par.RADIUS.to_numpy() ).max() }
+    return Run, Accuracy, 'curve', NCURVE
+
+def BenchHorAlignment( NPI ):
+    XY,RADIUS = SynthPIs( NPI )
+    def Run():
+        return HorAlignment( EPSG, XY, RADIUS, 20. )
+    def Accuracy( ha ):
+        arc = ha.gdfSTA[ ha.gdfSTA.CURVE>=0 ]
+        par = ha.dfPAR.loc[ arc.CURVE ]
+        r = np.hypot( *( shapely.get_coordinates( arc.geometry )-par[['ORIGIN_x','ORIGIN_y']].to_numpy() ).T )
+        return { 'err_radius_m': np.abs( r-par.RADIUS.to_numpy() ).max() }
+    return Run, Accuracy, 'curve', NPI
+
+def BenchFitCircRANSAC( RADIUS, DELTA=90, LEAD=30 ):
+    xy,center = SynthRoad( RADIUS, DELTA, LEAD, NOISE=0.05, SEED=0 )
+    EC = EstimateCurve.__new__( EstimateCurve )   # fit only , no staking
+    EC.EPSG = EPSG ; EC.ROAD_SECT = LineString( xy )
+    EC.ANALY_DIV = 0.5 ; EC.THRES = 0.2 ; EC.METHOD = 'ransac2d' ; EC.SEED = 0 ; EC.MEMO = None
+    def Run():
+        with contextlib.redirect_stdout( io.StringIO() ):
+            return EC.FitCircRANSAC()
+    def Accuracy( res ):
+        c,_,r = res
+        return { 'err_radius_m': abs(r-RADIUS), 'err_center_m': np.hypot( *(c[:2]-center) ),
+                 'rms_m': EC.FIT.RMS_INLIER }
+    return Run, Accuracy, 'point', int( EC.ROAD_SECT.length/EC.ANALY_DIV )
+
+def BenchSection( LEN_KM ):
+    LS = SynthRoute( LEN_KM )
+    DATA = pd.Series( { 'DIV': 1000, 'START_SECT': 0., 'BUFFER': 20., 'EPSG': EPSG } )
+    def Run():
+        return Section( DATA, LS )
+    def Accuracy( sect ):
+        loc = shapely.line_locate_point( LS, sect.dfSTA.geometry.values )
+        return { 'err_station_m': np.abs( loc-sect.dfSTA.ls_dist.to_numpy() ).max(),
+                 'n_tile': len(sect.dfTILE) }
+    return Run, Accuracy, 'km', LS.length/1000
+
+def BenchMakeDiff( SECONDS, OFFSET=0.05, DH=0.03 ):
+    REF,dfTEST = SynthTrajectory( SECONDS, OFFSET=OFFSET, DH=DH )
+    cmp = CmpTrajectory( pd.Series( { 'INSTRU': 'BENCH' } ), PIPELINE=True )
+    cmp.UseReference( REF )
+    def Run():
+        gdf = dfTEST.copy()
+        cmp.MakeDiff( gdf )
+        return gdf
+    def Accuracy( gdf ):
+        return { 'err_hor_m': np.nanmax( np.abs(gdf.HorDiff-OFFSET) ),
+                 'err_ver_m': np.nanmax( np.abs(gdf.VerDiff-DH) ),
+                 'err_sync_m': np.nanmax( np.abs(gdf.SyncDiff-OFFSET) ) }
+    return Run, Accuracy, 'epoch', len(dfTEST)
+
+BENCH = { 'CircularCurve' : ( BenchCircularCurve,  [10**3,10**4,10**5] ),      # point
+          'FromAlignments': ( BenchFromAlignments, [10**2,10**3,10**4] ),      # curve
+          'HorAlignment'  : ( BenchHorAlignment,   [10**2,10**3,10**4] ),      # PI
+          'FitCircRANSAC' : ( BenchFitCircRANSAC,  [50,300,1200] ),            # radius
+          'Section'       : ( BenchSection,        [10,100,1000] ),            # km
+          'MakeDiff'      : ( BenchMakeDiff,       [60,600,3600] ) }           # second
+
+def RunCase( NAME, SIZE, REPEAT=3 ):
+    ''' best of REPEAT timings , peak of the traced ( Python/numpy ) allocations
+        in one more run , items of the unit processed per second '''
+    MAKE,_ = BENCH[NAME]
+    Run,Accuracy,UNIT,NITEM = MAKE( SIZE )
+    times = [ Timing( Run )[0] for _ in range(REPEAT) ]
+    tracemalloc.start()
+    res = Run()
+    _,peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return { 'bench': NAME, 'size': SIZE, 'unit': UNIT, 'n_item': NITEM,
+             'time_s': min(times), 'per_s': NITEM/min(times), 'peak_MB': peak/2**20,
+             **{ k: float(v) for k,v in Accuracy( res ).items() } }
+
+###############################################################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser( description='benchmark suite of the curve/section/trajectory hot paths' )
+    parser.add_argument( '-b','--bench', nargs='+', default=list(BENCH), choices=list(BENCH),
+                help='benchmarks to run, default all' )
+    parser.add_argument( '-q','--quick', action='store_true', help='two smallest sizes only' )
+    parser.add_argument( '-r','--repeat', type=int, default=3, help='timings per case, best is kept' )
+    parser.add_argument( '-o','--out', default=None, help='write JSON lines into this file' )
+    parser.add_argument( '-c','--compare', default=None, help='JSON lines of a previous run' )
+    parser.add_argument( '-t','--tol', type=float, default=0.25,
+                help='with --compare, exit 1 if a case is slower by more than this fraction' )
+    args = parser.parse_args()
+    META = { 'python': platform.python_version(), 'numpy': np.__version__,
+             'shapely': shapely.__version__, 'machine': platform.machine(),
+             'date': time.strftime('%Y-%m-%dT%H:%M:%S') }
+    rows = list()
+    for NAME in args.bench:
+        for SIZE in BENCH[NAME][1][:2 if args.quick else None]:
+            row = RunCase( NAME, SIZE, REPEAT=args.repeat )
+            print( json.dumps( { **row, **META } ), flush=True )
+            rows.append( row )
+    df = pd.DataFrame( rows )
+    if args.out is not None:
+        with open( args.out, 'w' ) as f:
+            for row in rows: f.write( json.dumps( { **row, **META } )+'\n' )
+    if args.compare is not None:
+        dfBASE = pd.read_json( args.compare, lines=True )[['bench','size','time_s']]
+        df = df.merge( dfBASE, on=['bench','size'], how='left', suffixes=('','_base') )
+        df['ratio'] = df.time_s/df.time_s_base
+    print( df.to_markdown( index=False, floatfmt='.4g' ) )
+    if args.compare is not None:
+        slow = df[ df.ratio>1+args.tol ]
+        if len(slow):
+            print( f'***REGRESSION*** {len(slow)} case(s) slower than {args.compare} by >{args.tol:.0%}' )
+            sys.exit( 1 )
@@ -0,0 +1,81 @@
+#
+# CircFit.py : planar circle fitting for EstimateCurve, vectorized 2D RANSAC
+#              with seeded sampling and algebraic (Kasa/Taubin) refinement.
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import numpy as np
+
+def FitCircKasa( xy ):
+    ''' algebraic least-squares circle, x^2+y^2+Dx+Ey+F=0 , return (xc,yc),r '''
+    mean = xy.mean(axis=0)
+    x,y = (xy-mean).T
+    A = np.column_stack( [x, y, np.ones_like(x)] )
+    (D,E,F),*_ = np.linalg.lstsq( A, -(x*x+y*y), rcond=None )
+    xc,yc = -D/2, -E/2
+    return np.array([xc,yc])+mean, np.sqrt( xc*xc+yc*yc-F )
+
+def FitCircTaubin( xy ):
+    ''' Taubin algebraic circle fit (SVD form by N.Chernov), less biased than Kasa
+        on short arcs , return (xc,yc),r '''
+    mean = xy.mean(axis=0)
+    x,y = (xy-mean).T
+    z = x*x+y*y
+    zmean = z.mean()
+    z0 = (z-zmean)/(2*np.sqrt(zmean))
+    _,_,Vt = np.linalg.svd( np.column_stack([z0,x,y]), full_matrices=False )
+    A = Vt[2].copy()
+    A[0] = A[0]/(2*np.sqrt(zmean))
+    A = np.append( A, -zmean*A[0] )
+    center = -A[1:3]/A[0]/2
+    radius = np.sqrt( A[1]**2+A[2]**2-4*A[0]*A[3] )/abs(A[0])/2
+    return center+mean, radius
+
+def Circ3Pnts( p1, p2, p3 ):
+    ''' circumcircles of arrays of 3-point samples (M,2) , return (M,2) centers, (M,) radii,
+        collinear samples give nan '''
+    ax,ay = p1.T ; bx,by = p2.T ; cx,cy = p3.T
+    d = 2*( ax*(by-cy) + bx*(cy-ay) + cx*(ay-by) )
+    a2,b2,c2 = ax*ax+ay*ay, bx*bx+by*by, cx*cx+cy*cy
+    with np.errstate( divide='ignore', invalid='ignore' ):
+        ux = ( a2*(by-cy) + b2*(cy-ay) + c2*(ay-by) )/d
+        uy = ( a2*(cx-bx) + b2*(ax-cx) + c2*(bx-ax) )/d
+    ux[d==0] = np.nan ; uy[d==0] = np.nan
+    return np.column_stack([ux,uy]), np.hypot( ax-ux, ay-uy )
+
+def FitCircRANSAC2D( xy, thresh=0.2, maxIteration=1000, SEED=0, STOP_RATIO=0.95,
+                     CONFIDENCE=0.999, BATCH=128, REFINE='taubin' ):
+    ''' RANSAC circle on planar points xy (N,2). Hypotheses are drawn with a seeded
+        generator and scored BATCH at a time as one (BATCH,N) residual array. Stop
+        when the best inlier ratio reaches STOP_RATIO or enough samples have been
+        drawn for CONFIDENCE, then refine on the inliers by Kasa|Taubin.
+        return center(2,), radius, inliers (index array) '''
+    xy = np.asarray( xy, dtype=float )
+    mean = xy.mean(axis=0)
+    pnts = xy-mean                          # avoid cancellation on UTM coordinates
+    npnt = len(pnts)
+    rng = np.random.default_rng( SEED )
+    best_cnt = -1 ; best_center = best_radius = None
+    done = 0 ; need = maxIteration
+    while done<min(need,maxIteration):
+        nhyp = min( BATCH, maxIteration-done )
+        idx = rng.integers( 0, npnt, size=(nhyp,3) )  # repeated index -> collinear -> nan
+        center,radius = Circ3Pnts( pnts[idx[:,0]], pnts[idx[:,1]], pnts[idx[:,2]] )
+        resid = np.abs( np.hypot( pnts[None,:,0]-center[:,None,0],
+                                  pnts[None,:,1]-center[:,None,1] ) - radius[:,None] )
+        cnt = np.where( np.isfinite(radius), (resid<=thresh).sum(axis=1), -1 )
+        ibest = np.argmax( cnt )
+        if cnt[ibest]>best_cnt:
+            best_cnt,best_center,best_radius = cnt[ibest],center[ibest],radius[ibest]
+            ratio = best_cnt/npnt
+            if ratio>=STOP_RATIO: break
+            if ratio>0:
+                need = int(np.ceil( np.log(1-CONFIDENCE)/np.log(max(1-ratio**3,1e-12)) ))
+        done += nhyp
+    assert( best_center is not None ),'***ERROR*** no circle found, collinear points ?'
+    inliers = np.flatnonzero( np.abs( np.hypot(*(pnts-best_center).T)-best_radius )<=thresh )
+    if len(inliers)>=3:
+        FIT = FitCircTaubin if REFINE=='taubin' else FitCircKasa
+        best_center,best_radius = FIT( pnts[inliers] )
+        inliers = np.flatnonzero( np.abs( np.hypot(*(pnts-best_center).T)-best_radius )<=thresh )
+    return best_center+mean, best_radius, inliers
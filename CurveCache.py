@@ -0,0 +1,131 @@
+#
+# CurveCache.py : opt-in memoization of curve solutions. In-memory LRU bounded by
+#                 MAXSIZE with an optional .npz store under ./CACHE/CurveCache .
+#                 Key = hash of rounded alignment, radius, division, round-about
+#                 and EPSG, so re-runs and what-if sweeps become a lookup.
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pathlib import Path
+from collections import OrderedDict
+from shapely.geometry import Point
+from CurvePnts import CircularCurve
+
+class CurveCache:
+    def __init__(self, MAXSIZE=1024, DISK=False, DECIMALS=3 ):
+        ''' DISK : False | True (./CACHE/CurveCache) | directory path
+            DECIMALS : rounding of coordinates/radius/division in the key '''
+        self.MAXSIZE = MAXSIZE
+        self.DECIMALS = DECIMALS
+        self.LRU = OrderedDict()
+        self.DISK = None
+        if DISK:
+            self.DISK = Path('./CACHE/CurveCache') if DISK is True else Path(DISK)
+            self.DISK.mkdir(parents=True, exist_ok=True)
+        self.HIT = self.DISK_HIT = self.MISS = self.EVICT = 0
+
+    def Key( self, *PARTS ):
+        ''' canonical sha1 of the parts, floats and coordinate arrays rounded '''
+        def canon(p):
+            if isinstance( p, (bool,np.bool_) ): return bool(p)
+            if isinstance( p, (float,int,np.floating,np.integer) ):
+                return round( float(p), self.DECIMALS )
+            if isinstance( p, np.ndarray ): return np.round( p, self.DECIMALS ).tolist()
+            return str(p)
+        txt = json.dumps( [ canon(p) for p in PARTS ] )
+        return hashlib.sha1( txt.encode() ).hexdigest()
+
+    def Get( self, KEY, COMPUTE, DUMP=None, LOAD=None ):
+        ''' value of KEY from memory, disk (if DUMP/LOAD given) or COMPUTE() '''
+        if KEY in self.LRU:
+            self.HIT += 1
+            self.LRU.move_to_end( KEY )
+            return self.LRU[KEY]
+        NPZ = None if (self.DISK is None or DUMP is None) else self.DISK / f'{KEY}.npz'
+        if NPZ is not None and NPZ.exists():
+            self.DISK_HIT += 1
+            with np.load( NPZ ) as npz:
+                value = LOAD( dict(npz) )
+        else:
+            self.MISS += 1
+            value = COMPUTE()
+            if NPZ is not None: np.savez( NPZ, **DUMP(value) )
+        self.LRU[KEY] = value
+        if len(self.LRU)>self.MAXSIZE:
+            self.LRU.popitem( last=False )
+            self.EVICT += 1
+        return value
+
+    def Stats( self ):
+        return pd.Series( { 'HIT': self.HIT, 'DISK_HIT': self.DISK_HIT, 'MISS': self.MISS,
+                            'EVICT': self.EVICT, 'SIZE': len(self.LRU) } )
+
+    def Clear( self ):
+        self.LRU.clear()
+
+MEMO = CurveCache()   # default cache of CachedCurve()
+
+###############################################################################
+def _DumpCurve( cc ):
+    PAR = cc.PAR
+    data = { 'xy': shapely.get_coordinates( cc.gdfPNT.geometry ),
+             'cvDist': cc.gdfPNT.cvDist.to_numpy(dtype=str),
+             'Name': cc.gdfPNT.Name.to_numpy(dtype=str),
+             'Element': cc.gdfPNT.Element.to_numpy(dtype=str),
+             'DEFLdms': np.array( PAR.DEFLdms ) }
+    for k in ['sgDEFL','DEFL','TL','LENCUR']: data[k] = np.array( PAR[k] )
+    for k in ['PC','PI','PT','ORIGIN','MO']:  data[k] = np.array( PAR[k].coords[0] )
+    return data
+
+def _LoadCurve( npz, EPSG, ALIGN, RADIUS, DIV, ROUND_ABOUT ):
+    ''' rebuild a CircularCurve from its stored arrays without recomputing '''
+    cc = CircularCurve.__new__( CircularCurve )
+    cc.CACHE = Path( './CACHE' )
+    cc.PLOT = cc.CACHE.joinpath('Plot_Curve')
+    PAR = pd.Series( {'EPSG':EPSG, 'ALIGN' : ALIGN, 'RADIUS' : RADIUS,
+                      'DIV': DIV, 'ROUND_ABOUT': ROUND_ABOUT } )
+    PAR['sgDEFL'] = float(npz['sgDEFL']) ; PAR['DEFL'] = float(npz['DEFL'])
+    PAR['DEFLdms'] = str(npz['DEFLdms'])
+    PAR['TL'] = float(npz['TL']) ; PAR['LENCUR'] = float(npz['LENCUR'])
+    for k in ['PC','PI','PT','ORIGIN','MO']: PAR[k] = Point( npz[k] )
+    cc.PAR = PAR
+    dfPNT = pd.DataFrame( { 'cvDist': npz['cvDist'].astype(object),
+                            'Name': npz['Name'].astype(object),
+                            'Element': npz['Element'].astype(object) } )
+    cc.gdfPNT = gpd.GeoDataFrame( dfPNT, crs=EPSG,
+                            geometry=gpd.points_from_xy( *npz['xy'].T, crs=EPSG ) )
+    return cc
+
+def CachedCurve( EPSG, ALIGN, RADIUS, DIV, ROUND_ABOUT=False, MEMO=MEMO ):
+    ''' CircularCurve(...) through MEMO, the returned instance is shared between
+        identical requests and must not be modified in place '''
+    # 'CircularCurve/2' : npz entries with the Element column
+    KEY = MEMO.Key( 'CircularCurve/2', EPSG, shapely.get_coordinates(ALIGN),
+                    RADIUS, DIV, ROUND_ABOUT )
+    return MEMO.Get( KEY, lambda: CircularCurve( EPSG, ALIGN, RADIUS, DIV, ROUND_ABOUT ),
+                     DUMP=_DumpCurve,
+                     LOAD=lambda npz: _LoadCurve( npz, EPSG, ALIGN, RADIUS, DIV, ROUND_ABOUT ) )
+
+###############################################################################
+if __name__=="__main__":
+    # self check of the key : same ALIGN is a HIT , another ALIGN or RADIUS a MISS
+    from shapely.geometry import LineString
+    memo = CurveCache()
+    ALIGN1 = LineString( [ [0,0], [1000,0], [2000,1000] ] )
+    ALIGN2 = LineString( [ [0,0], [1000,0], [2000,-500] ] )
+    a = CachedCurve( 32647, ALIGN1, 300., 20., MEMO=memo )
+    b = CachedCurve( 32647, LineString( ALIGN1.coords ), 300., 20., MEMO=memo )
+    assert( a is b and memo.HIT==1 and memo.MISS==1 ),'***ERROR*** same ALIGN must HIT'
+    c = CachedCurve( 32647, ALIGN2, 300., 20., MEMO=memo )
+    assert( c is not a and memo.MISS==2 ),'***ERROR*** another ALIGN must MISS'
+    d = CachedCurve( 32647, ALIGN1, 400., 20., MEMO=memo )
+    assert( d is not a and memo.MISS==3 ),'***ERROR*** another RADIUS must MISS'
+    assert( not a.PAR.PT.equals( c.PAR.PT ) ),'***ERROR*** cached curve of another ALIGN'
+    print( memo.Stats().to_markdown() )
+    print( 'CurveCache self check ... OK' )
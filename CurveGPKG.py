@@ -0,0 +1,133 @@
+#
+# CurveGPKG.py : one GeoPackage per run for the GIS layers of many curves .
+#                CurveLoci/Elements/Road/InlierPnt of every curve are collected
+#                with a curve_id column , spilled in large Arrow IPC batches and
+#                written by pyogrio once per layer at Close() , i.e. one transaction
+#                per layer and the rtree spatial index built once at the end .
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import importlib.util
+import shutil
+import tempfile
+import pandas as pd
+import shapely
+from pathlib import Path
+from Instrument import PROF, GetLogger
+
+LOG = GetLogger( 'CurveGPKG' )
+
+def ReadSpill( IPCS, schema ):
+    ''' record batches of the IPC files IPCS conformed to the unified schema ,
+        dtypes promoted and missing columns as nulls '''
+    import pyarrow as pa
+    for IPC in IPCS:
+        with pa.memory_map( str(IPC) ) as src:
+            rd = pa.ipc.open_file( src )
+            for i in range( rd.num_record_batches ):
+                bat = rd.get_batch( i )
+                if bat.schema!=schema:
+                    bat = pa.RecordBatch.from_arrays(
+                        [ bat.column( f.name ).cast( f.type ) if f.name in bat.schema.names
+                          else pa.nulls( bat.num_rows, f.type ) for f in schema ], schema=schema )
+                yield bat
+
+class CurveGPKG:
+    def __init__(self, GPKG, FLUSH=200_000 ):
+        ''' GPKG : output file , replaced ; FLUSH : buffered rows ( all layers ) before
+            a batch is spilled to disk , without pyarrow all rows stay in memory '''
+        self.GPKG = Path(GPKG)
+        self.GPKG.parent.mkdir( parents=True, exist_ok=True )
+        self.FLUSH = FLUSH
+        self.ARROW = importlib.util.find_spec('pyarrow') is not None
+        self.BUF = dict()       # layer -> list of GeoDataFrame
+        self.NBUF = 0
+        self.SPILL = dict()     # layer -> list of ipc paths , one per Flush()
+        self.CRS = dict()
+        self.GTYPE = dict()
+        self.NCURVE = 0
+        self.TMP = None
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc ):
+        try:
+            if exc[0] is None: self.Close()
+        finally:
+            self.Cleanup()
+
+    def Cleanup( self ):
+        ''' drop the spill files , also after an error '''
+        self.SPILL.clear()
+        if self.TMP is not None: shutil.rmtree( self.TMP, ignore_errors=True )
+        self.TMP = None
+
+    def Add( self, CURVE_ID, CURVE ):
+        ''' GisLayers() of a CircularCurve/EstimateCurve '''
+        self.AddLayers( CURVE_ID, CURVE.GisLayers() )
+
+    def AddLayers( self, CURVE_ID, LAYERS ):
+        ''' LAYERS : layer name -> GeoDataFrame of curve CURVE_ID '''
+        for LAYER,gdf in LAYERS.items():
+            gdf = gdf.copy()
+            gdf.insert( 0, 'curve_id', CURVE_ID )
+            self.BUF.setdefault( LAYER, [] ).append( gdf )
+            self.NBUF += len(gdf)
+        self.NCURVE += 1
+        if self.ARROW and self.NBUF>=self.FLUSH: self.Flush()
+
+    @PROF.Timed
+    def Flush( self ):
+        ''' the buffered rows of each layer into a new IPC file of its own schema ,
+            a column all null or of another dtype in an earlier batch is unified
+            at Close() '''
+        import pyarrow as pa
+        if self.TMP is None:
+            self.TMP = Path( tempfile.mkdtemp( prefix=f'{self.GPKG.stem}_', dir=self.GPKG.parent ) )
+        for LAYER,gdfs in self.BUF.items():
+            tab = self.Collect( LAYER, gdfs ).to_arrow( index=False, geometry_encoding='WKB' )
+            tab = pa.table( tab )
+            IPC = self.TMP / f'{LAYER}_{len(self.SPILL.get(LAYER,[])):04d}.arrow'
+            with pa.ipc.new_file( IPC, tab.schema ) as writer:
+                writer.write_table( tab )
+            self.SPILL.setdefault( LAYER, [] ).append( IPC )
+        self.BUF.clear() ; self.NBUF = 0
+
+    def Collect( self, LAYER, gdfs ):
+        ''' concat the buffered frames of LAYER , crs and layer type from the first batch '''
+        gdf = pd.concat( gdfs, ignore_index=True )
+        if LAYER not in self.GTYPE:
+            self.CRS[LAYER] = None if gdf.crs is None else gdf.crs.to_wkt()
+            types = gdf.geometry.geom_type.dropna().unique()
+            GTYPE = types[0] if len(types)==1 else 'Unknown'
+            if GTYPE!='Unknown' and shapely.has_z( gdf.geometry.values ).any(): GTYPE += ' Z'
+            self.GTYPE[LAYER] = GTYPE
+        return gdf
+
+    @PROF.Timed
+    def Close( self ):
+        ''' write each layer in one pyogrio call ( one transaction per layer ) and
+            drop the spill files '''
+        import pyogrio
+        self.GPKG.unlink( missing_ok=True )
+        LOG.info( f'CurveGPKG:Close() writing {self.NCURVE} curves into {self.GPKG} ...' )
+        if not self.ARROW:
+            for LAYER,gdfs in self.BUF.items():
+                gdf = self.Collect( LAYER, gdfs )
+                pyogrio.write_dataframe( gdf, self.GPKG, layer=LAYER, driver='GPKG',
+                                         geometry_type=self.GTYPE[LAYER] )
+            self.BUF.clear() ; self.NBUF = 0
+            return
+        import pyarrow as pa
+        try:
+            if self.NBUF: self.Flush()
+            for LAYER,IPCS in self.SPILL.items():
+                schema = pa.unify_schemas( [ pa.ipc.open_file( IPC ).schema for IPC in IPCS ],
+                                           promote_options='permissive' )
+                batches = pa.RecordBatchReader.from_batches( schema, ReadSpill( IPCS, schema ) )
+                pyogrio.write_arrow( batches, self.GPKG, layer=LAYER, driver='GPKG',
+                                     geometry_name='geometry', geometry_type=self.GTYPE[LAYER],
+                                     crs=self.CRS[LAYER] )
+        finally:
+            self.Cleanup()
@@ -7,45 +7,132 @@ PROG="""\
           18 Jun 2024 : version 0.5
 """
 import sys 
+import math
+import json
+import contextlib
 import numpy as np 
 import pandas as pd
 import geopandas as gpd
-from skspatial.objects import Vector
+import shapely
 from shapely.geometry import LineString,Point
-from shapely.affinity import translate, rotate
+from shapely.affinity import rotate
 from pathlib import Path
-import matplotlib.pyplot as plt
+from dataclasses import dataclass
 from pygeodesy import dms
+from Instrument import PROF, GetLogger
+
+LOG = GetLogger( 'CurvePnts' )
+
+#####################################################################################
+@dataclass(slots=True)
+class CurveSolution:
+    ''' numeric parameters of one circular curve, plain floats, no geometry '''
+    RADIUS : float
+    ROUND_ABOUT : bool
+    sgDEFL : float
+    DEFL   : float
+    TL     : float
+    LENCUR : float
+    PC_x : float ; PC_y : float
+    PI_x : float ; PI_y : float
+    PT_x : float ; PT_y : float
+    ORIGIN_x : float ; ORIGIN_y : float
+    MO_x : float ; MO_y : float
+
+def SolveCurve( pc, pi, pt, RADIUS, ROUND_ABOUT=False ):
+    ''' compute-only core of CircularCurve from PC-PI-PT (x,y) tuples, no print,
+        no CACHE, no GeoDataFrame , return CurveSolution '''
+    (xc,yc),(xi,yi),(xt,yt) = pc,pi,pt
+    ax,ay,bx,by = xi-xc, yi-yc, xt-xi, yt-yi
+    sgDEFL = math.atan2( bx*ay-by*ax, bx*ax+by*ay )
+    DEFL = abs( sgDEFL )
+    TL = RADIUS*math.tan( DEFL/2 )
+    LENCUR = 2*math.pi*RADIUS-RADIUS*DEFL if ROUND_ABOUT else RADIUS*DEFL
+    pi_pc = math.hypot( ax,ay ) ; pi_pt = math.hypot( bx,by )
+    assert( pi_pc>=TL  ),'***ERROR** leadin PC too shore!'
+    assert( pi_pt>=TL ),'***ERROR** leadout PT too shore!'
+    PC_x,PC_y = xi-ax*TL/pi_pc, yi-ay*TL/pi_pc
+    PT_x,PT_y = xi+bx*TL/pi_pt, yi+by*TL/pi_pt
+    y0 = -RADIUS if sgDEFL<0. else RADIUS
+    sgRot = math.atan2( yi-PC_y, xi-PC_x )
+    O_x,O_y = PC_x+math.sin(sgRot)*y0, PC_y-math.cos(sgRot)*y0
+    om = RADIUS/math.hypot( xi-O_x, yi-O_y )
+    return CurveSolution( RADIUS, ROUND_ABOUT, sgDEFL, DEFL, TL, LENCUR, PC_x, PC_y, xi, yi,
+                          PT_x, PT_y, O_x, O_y, O_x+(xi-O_x)*om, O_y+(yi-O_y)*om )
+
+def SolveCurves( pc, pi, pt, RADIUS, ROUND_ABOUT=False ):
+    ''' array form of SolveCurve() for N curves , pc,pi,pt : (N,2) , RADIUS and
+        ROUND_ABOUT scalar or (N,) , return dict of (N,) / (N,2) arrays , TL_OK False
+        where lead-in or lead-out is shorter than TL . The normalized arc starts at
+        p000=(0,y0) , translated onto PC and rotated by sgRot about PC '''
+    N = len(pi)
+    RADIUS = np.broadcast_to( np.asarray(RADIUS,dtype=float), N )
+    ROUND  = np.broadcast_to( np.asarray(ROUND_ABOUT,dtype=bool), N )
+    vcPC = pi-pc ; vcPI = pt-pi
+    sgDEFL = np.arctan2( vcPI[:,0]*vcPC[:,1]-vcPI[:,1]*vcPC[:,0],
+                         vcPI[:,0]*vcPC[:,0]+vcPI[:,1]*vcPC[:,1] )
+    DEFL = np.abs( sgDEFL )
+    TL = RADIUS*np.tan( DEFL/2 )
+    LENCUR = np.where( ROUND, 2*np.pi*RADIUS-RADIUS*DEFL, RADIUS*DEFL )
+    pi_pc = np.hypot( *(pc-pi).T ) ; pi_pt = np.hypot( *(pt-pi).T )
+    PC = pi + (pc-pi)*(TL/pi_pc)[:,None]
+    PT = pi + (pt-pi)*(TL/pi_pt)[:,None]
+    y0 = np.where( sgDEFL<0., -RADIUS, RADIUS )
+    sgRot = np.arctan2( pi[:,1]-PC[:,1], pi[:,0]-PC[:,0] )
+    cosR,sinR = np.cos(sgRot),np.sin(sgRot)
+    ORIGIN = PC + np.column_stack( [ sinR*y0, -cosR*y0 ] )
+    vcMO = pi-ORIGIN
+    MO = ORIGIN + vcMO*(RADIUS/np.hypot( *vcMO.T ))[:,None]
+    return { 'RADIUS':RADIUS, 'ROUND_ABOUT':ROUND, 'sgDEFL':sgDEFL, 'DEFL':DEFL, 'TL':TL,
+             'LENCUR':LENCUR, 'pi_pc':pi_pc, 'pi_pt':pi_pt, 'TL_OK':(pi_pc>=TL) & (pi_pt>=TL),
+             'PC':PC, 'PI':pi, 'PT':PT, 'ORIGIN':ORIGIN, 'MO':MO, 'y0':y0, 'cosR':cosR, 'sinR':sinR }
+
+def ArcXY( SOL, crv, cvDist ):
+    ''' map coordinates of points cvDist meter along curves crv of SolveCurves() SOL '''
+    theta = cvDist/SOL['RADIUS'][crv]
+    x = np.where( SOL['ROUND_ABOUT'][crv], -1., 1. )*SOL['RADIUS'][crv]*np.sin(theta)
+    y = SOL['y0'][crv]*(np.cos(theta)-1.)
+    cosR,sinR,PC = SOL['cosR'][crv], SOL['sinR'][crv], SOL['PC'][crv]
+    return PC[:,0] + cosR*x - sinR*y, PC[:,1] + sinR*x + cosR*y
 
 #####################################################################################
 class CircularCurve:
+    KEYPNT = ['PC','PI','PT','ORIGIN','MO']    # key points plotted and answered
+    ENDS   = ['PC','PT']                       # ends of the circular arc
     def __init__(self, EPSG, ALIGN, RADIUS, DIV, ROUND_ABOUT=False ):
-        self.CACHE = Path( './CACHE' )
-        self.CACHE.mkdir(parents=True, exist_ok=True)
+        self.CACHE = Path( './CACHE' )   # created on DoPlot()/WriteGIS() only
         self.PLOT = self.CACHE.joinpath('Plot_Curve')
         PAR = pd.Series( {'EPSG':EPSG, 'ALIGN' : ALIGN, 'RADIUS' : RADIUS, 
                               'DIV': DIV, 'ROUND_ABOUT': ROUND_ABOUT } )
         assert( len(PAR.ALIGN.coords) ==3 ),'***ERROR*** limit 3 points on LS_ALIGN'
-        pc,pi,pt = list(ALIGN.coords)
-        vcPC = Vector.from_points( pc,pi )
-        vcPI = Vector.from_points( pi,pt )
-        sgDEFLEC = vcPI.angle_signed( vcPC )
+        (xc,yc),(xi,yi),(xt,yt) = list(ALIGN.coords)
+        ax,ay,bx,by = xi-xc, yi-yc, xt-xi, yt-yi
+        sgDEFLEC = math.atan2( bx*ay-by*ax, bx*ax+by*ay )    # PI->PT to PC->PI , as SolveCurve()
         PAR['sgDEFL']   = sgDEFLEC
         PAR['DEFL']     = abs( sgDEFLEC )
         PAR['DEFLdms' ] = dms.toDMS( np.degrees(sgDEFLEC), prec=1 )
-        print( f'Deflection angle : {np.degrees(PAR.sgDEFL)} ...' )
-        print( f'Deflection angle : {PAR.DEFLdms} ...' )
+        LOG.debug( f'Deflection angle : {np.degrees(PAR.sgDEFL)} ...' )
+        LOG.debug( f'Deflection angle : {PAR.DEFLdms} ...' )
         self.PAR = PAR
         #import pdb ;pdb.set_trace()
         self.GenNormArc()
         self.RotTransNormArc()
-        LS_PNT = LineString( list(self.gdfPNT.geometry) )
-        LS_PC = LineString( [PAR.ORIGIN,PAR.PC] ) 
-        LS_PI = LineString( [PAR.ORIGIN,PAR.PI] ) 
-        LS_PT = LineString( [PAR.ORIGIN,PAR.PT] ) 
-        self.dfLS = gpd.GeoDataFrame( {'Type': ['Alignment', 'POC', 'O_PC', 'O_MO', 'O_PT'] },
-                                   crs=EPSG, geometry=([PAR.ALIGN,LS_PNT,LS_PC,LS_PI,LS_PT ]) ) 
 
+    @property
+    def dfLS(self):
+        ''' curve elements as GeoDataFrame, built on first use '''
+        if getattr( self, '_dfLS', None ) is None:
+            PAR = self.PAR
+            LS_PNT = LineString( shapely.get_coordinates( self.gdfPNT.geometry ) )
+            BEG,END = self.ENDS
+            LS_PC = LineString( [PAR.ORIGIN,PAR[BEG]] ) 
+            LS_PI = LineString( [PAR.ORIGIN,PAR.PI] ) 
+            LS_PT = LineString( [PAR.ORIGIN,PAR[END]] ) 
+            self._dfLS = gpd.GeoDataFrame( {'Type': ['Alignment', 'POC', f'O_{BEG}', 'O_MO', f'O_{END}'] },
+                            crs=PAR.EPSG, geometry=([PAR.ALIGN,LS_PNT,LS_PC,LS_PI,LS_PT ]) ) 
+        return self._dfLS
+
+    @PROF.Timed
     def GenNormArc(self):
         ''' curvature at origin (0,0) draw arc clock-wise '''
         PAR = self.PAR
@@ -62,16 +149,14 @@ class CircularCurve:
         ndiv,rest = divmod(PAR.LENCUR, PAR.DIV)
         pnt_div = np.linspace(rest/2,PAR.LENCUR-rest/2,num=int(ndiv)+1,endpoint=True )
         pnts = np.concatenate( [np.array([0]), pnt_div, np.array([PAR.LENCUR]) ] )
-        dfPNT = pd.DataFrame( pnts, columns=['cvDist'] )
-        def DoCurve(row, PAR):
-            theta = row.cvDist/PAR.RADIUS
-            x,y = PAR.RADIUS*np.sin(theta),PAR.RADIUS*np.cos(theta)
-            if PAR.sgDEFL<0.   : y=-y
-            if PAR.ROUND_ABOUT : x=-x
-            return [ f'{row.cvDist:03.0f}', f'{row.cvDist:.3f}', Point(x,y) ]
-        dfPNT[['Name','cvDist', 'geometry']] = dfPNT.apply( DoCurve, 
-                                  axis=1, result_type='expand', args=(PAR,) )
-        gdfPNT = gpd.GeoDataFrame( dfPNT, crs=PAR.EPSG, geometry=dfPNT.geometry )
+        theta = pnts/PAR.RADIUS
+        x,y = PAR.RADIUS*np.sin(theta),PAR.RADIUS*np.cos(theta)
+        if PAR.sgDEFL<0.   : y=-y
+        if PAR.ROUND_ABOUT : x=-x
+        dfPNT = pd.DataFrame( { 'cvDist': np.char.mod( '%.3f', pnts ), 
+                                'Name'  : np.char.mod( '%03.0f', pnts ),
+                                'Element': np.where( pnts==0., 'PC', 'PC-PT' ) } )
+        gdfPNT = gpd.GeoDataFrame( dfPNT, crs=PAR.EPSG, geometry=gpd.points_from_xy(x,y) )
         self.gdfPNT=gdfPNT
         ############################################
         PC = LineString( [ pi,pc ]).interpolate( PAR.TL, normalized=False )
@@ -80,53 +165,280 @@ class CircularCurve:
         PAR['PI'] = Point(pi) 
         PAR['PT'] = PT
 
+    @PROF.Timed
     def RotTransNormArc(self):
         PAR = self.PAR
-        p000  = self.gdfPNT.iloc[0].geometry
+        p000  = self.gdfPNT.geometry.iloc[0]
         dx,dy = PAR.PC.x-p000.x, PAR.PC.y-p000.y
-        PC_PI = Vector.from_points(list(PAR.PC.coords[0]) ,list(PAR.PI.coords[0]) )
-        sgRot = Vector([1,0]).angle_signed( PC_PI )
-        def RotTr(row,dx,dy,sgRot,pntPC):
-            x,y   = row.geometry.x, row.geometry.y
-            x_,y_ = x+dx , y+dy
-            return rotate( Point( x_,y_),sgRot, origin=(pntPC.x,pntPC.y), use_radians=True ) 
-        self.gdfPNT['geometry'] = self.gdfPNT.apply( RotTr, axis=1, 
-                            result_type='expand', args=( dx,dy,sgRot,PAR.PC ) )
+        sgRot = math.atan2( PAR.PI.y-PAR.PC.y, PAR.PI.x-PAR.PC.x )
+        # translate p000 onto PC then rotate about PC, all points in one pass
+        x_ = self.gdfPNT.geometry.x.to_numpy() + dx - PAR.PC.x
+        y_ = self.gdfPNT.geometry.y.to_numpy() + dy - PAR.PC.y
+        cosR,sinR = np.cos(sgRot),np.sin(sgRot)
+        self.gdfPNT['geometry'] = gpd.points_from_xy( PAR.PC.x + cosR*x_ - sinR*y_,
+                                                      PAR.PC.y + sinR*x_ + cosR*y_, crs=PAR.EPSG )
         PAR['ORIGIN'] = rotate( Point( dx,dy),sgRot, origin=(PAR.PC.x,PAR.PC.y), use_radians=True ) 
         PAR['MO']  = LineString( [PAR.ORIGIN,PAR.PI] ).interpolate(PAR.RADIUS,normalized=False )
+        PROF.Count( 'CircularCurve.points', len(self.gdfPNT) )
 
-    def DoPlot(self, SUFFIX=None ):
-        fig, ax = plt.subplots( figsize=(20,18))
-        self.dfLS.plot( ax=ax ) 
-        for i,row in self.gdfPNT.iterrows():
-            x =  row.geometry.x ; y =  row.geometry.y
-            ax.scatter( x, y, c='k', s=30, alpha=0.5 )
-            ax.text( x,y, s=row['Name'], c='g', fontsize=15 )
-        for pnt in ['PC','PI','PT','ORIGIN','MO']: 
+    @PROF.Timed
+    def DoPlot(self, SUFFIX=None, LABEL_SPACING=None, PDF=True ):
+        ''' plot on a bare Agg Figure ( no pyplot state , safe in worker processes ) ,
+            all points-on-curve in one scatter call .
+            LABEL_SPACING : meter along curve between point labels , None = all
+            PDF : write .pdf as well as .png '''
+        from matplotlib.figure import Figure       # plotting only , slow to import
+        from matplotlib.collections import LineCollection
+        self.CACHE.mkdir(parents=True, exist_ok=True)
+        fig = Figure( figsize=(20,18) )
+        ax = fig.add_subplot()
+        ax.add_collection( LineCollection( [ shapely.get_coordinates(ls) for ls in self.dfLS.geometry ] ) )
+        xy = shapely.get_coordinates( self.gdfPNT.geometry )
+        ax.scatter( xy[:,0], xy[:,1], c='k', s=30, alpha=0.5 )
+        label = np.ones( len(xy), dtype=bool )
+        if LABEL_SPACING is not None:   # first point in each spacing , and the last
+            bins = np.floor( self.gdfPNT.cvDist.astype(float).to_numpy()/LABEL_SPACING )
+            label[1:] = bins[1:]!=bins[:-1] ; label[-1] = True
+        for (x,y),name in zip( xy[label], self.gdfPNT.Name.to_numpy()[label] ):
+            ax.text( x,y, s=name, c='g', fontsize=15 )
+        KEY = self.KEYPNT
+        ax.scatter( [self.PAR[pnt].x for pnt in KEY], [self.PAR[pnt].y for pnt in KEY], c='r', s=50 )
+        for pnt in KEY: 
             geom = self.PAR[pnt]
-            ax.scatter( geom.x, geom.y, c='r', s=50 )
             ax.text( geom.x,geom.y, s=pnt, c='r', fontsize=20 )
-        C_DATA = f'R = {self.PAR.RADIUS:.3f} m.\n\u03B4 = {self.PAR.DEFLdms}\n'\
-                 f'LEN = {self.PAR.LENCUR:.3f} m.\nTangential (T) = {self.PAR.TL:.3f} m\n'\
-                 f'Division: {self.PAR.DIV} m.'
+        C_DATA = self.PlotText()
         om = LineString([self.PAR.MO,self.PAR.ORIGIN]).centroid
         ax.text( om.x,om.y,s=C_DATA,c='r',fontsize=15, ha='center', va='center' )
+        ax.autoscale_view()
         ax.tick_params(axis='x', rotation=90)
         ax.ticklabel_format( useOffset=False, style='plain' )
-        plt.gca().set_aspect('equal')
-        plt.grid()
-        print(f'CircularCurve:DoPlot() Writing result "pdf|png" into ./{self.CACHE}/...')
+        ax.set_aspect('equal')
+        ax.grid()
+        LOG.info(f'CircularCurve:DoPlot() Writing result "{"pdf|" if PDF else ""}png" into ./{self.CACHE}/...')
         if SUFFIX is None: PLT = self.PLOT 
         else: PLT = f'{self.PLOT}_{SUFFIX}'
-        plt.savefig( f'{PLT}.png' )
-        plt.savefig( f'{PLT}.pdf' )
+        fig.savefig( f'{PLT}.png' )
+        if PDF: fig.savefig( f'{PLT}.pdf' )
 
+    def PlotText( self ):
+        return f'R = {self.PAR.RADIUS:.3f} m.\n\u03B4 = {self.PAR.DEFLdms}\n'\
+               f'LEN = {self.PAR.LENCUR:.3f} m.\nTangential (T) = {self.PAR.TL:.3f} m\n'\
+               f'Division: {self.PAR.DIV} m.'
+
+    def GisLayers( self ):
+        ''' layer name -> GeoDataFrame written by WriteGIS() and CurveGPKG '''
+        return { 'CurveLoci': self.gdfPNT, 'Elements': self.dfLS }
+
+    @PROF.Timed
     def WriteGIS( self, SUFFIX=None ):
-        print(f'CircularCurve:WriteGIS() "csv|gpkg" into ./{self.CACHE}/...')
+        LOG.info(f'CircularCurve:WriteGIS() "csv|gpkg" into ./{self.CACHE}/...')
+        self.CACHE.mkdir(parents=True, exist_ok=True)
         if SUFFIX is None: PLT = f'{self.PLOT}.gpkg' 
         else: PLT = f'{self.PLOT}_{SUFFIX}.gpkg' 
-        self.gdfPNT.to_file( PLT , driver='GPKG', layer='CurveLoci' ) 
-        self.dfLS.to_file( PLT, driver='GPKG', layer='Elements' ) 
+        for LAYER,gdf in self.GisLayers().items():
+            gdf.to_file( PLT, driver='GPKG', layer=LAYER )
+
+    @staticmethod
+    def FromAlignments( ALIGNS, RADIUS, DIV, ROUND_ABOUT=False, EPSG=None ):
+        ''' batch staking of N curves in one pass of array math, no print/CACHE.
+            ALIGNS : GeoDataFrame of 3-point LineStrings or array (N,3,2) of PC-PI-PT
+            RADIUS, DIV, ROUND_ABOUT : scalar or per-curve array
+            return dfPAR  : one row per curve ( DEFL,TL,LENCUR,PC/PI/PT/ORIGIN/MO )
+                   gdfPNT : points-on-curve of all curves keyed by column CURVE
+            curves with lead-in/lead-out shorter than TL are flagged TL_OK=False
+            and produce no points-on-curve '''
+        if isinstance( ALIGNS, gpd.GeoDataFrame ):
+            if EPSG is None: EPSG = ALIGNS.crs
+            CURVE = ALIGNS.index.to_numpy()
+            coords = shapely.get_coordinates( ALIGNS.geometry.values )
+            assert( len(coords)==3*len(ALIGNS) ),'***ERROR*** limit 3 points on LS_ALIGN'
+            ALIGNS = coords.reshape( -1,3,2 )
+        else:
+            ALIGNS = np.asarray( ALIGNS, dtype=float )
+            assert( ALIGNS.shape[1:]==(3,2) ),'***ERROR*** ALIGNS must be (N,3,2)'
+            CURVE = np.arange( len(ALIGNS) )
+        N = len(ALIGNS)
+        DIV = np.broadcast_to( np.asarray(DIV,dtype=float), N )
+        SOL = SolveCurves( ALIGNS[:,0], ALIGNS[:,1], ALIGNS[:,2], RADIUS, ROUND_ABOUT )
+        RADIUS,ROUND,LENCUR,TL_OK = SOL['RADIUS'],SOL['ROUND_ABOUT'],SOL['LENCUR'],SOL['TL_OK']
+        dfPAR = pd.DataFrame( { 'CURVE':CURVE, 'RADIUS':RADIUS, 'DIV':DIV,
+                    'ROUND_ABOUT':ROUND, 'sgDEFL':SOL['sgDEFL'], 'DEFL':SOL['DEFL'], 'TL':SOL['TL'],
+                    'LENCUR':LENCUR, 'TL_OK':TL_OK } )
+        for name in ['PC','PI','PT','ORIGIN','MO']:
+            dfPAR[f'{name}_x'] = SOL[name][:,0] ; dfPAR[f'{name}_y'] = SOL[name][:,1]
+        #### ragged points-on-curve : 0, linspace(rest/2,LENCUR-rest/2), LENCUR
+        idx = np.flatnonzero( TL_OK )
+        ndiv,rest = np.divmod( LENCUR[idx], DIV[idx] )
+        npnt = ndiv.astype(int)+3
+        crv = np.repeat( idx, npnt )
+        k = np.arange( npnt.sum() ) - np.repeat( np.cumsum(npnt)-npnt, npnt )
+        step = np.divide( LENCUR[idx]-rest, ndiv, out=np.zeros_like(ndiv), where=ndiv>0 )
+        last = np.repeat( npnt-1, npnt )
+        half = np.repeat( rest/2, npnt )
+        cvDist = np.select( [ k==0, k==last, k==last-1 ], [ 0., LENCUR[crv], LENCUR[crv]-half ],
+                            default=half+(k-1)*np.repeat( step, npnt ) )
+        east,north = ArcXY( SOL, crv, cvDist )
+        dfPNT = pd.DataFrame( { 'CURVE': CURVE[crv], 'cvDist': np.char.mod( '%.3f', cvDist ),
+                                'Name' : np.char.mod( '%03.0f', cvDist ) } )
+        gdfPNT = gpd.GeoDataFrame( dfPNT, crs=EPSG, geometry=gpd.points_from_xy(east,north) )
+        return dfPAR,gdfPNT
+
+#####################################################################################
+def ClothoidXY( l, A2, NTERM=12 ):
+    ''' local (x,y) of a clothoid at arc lengths l ( array ) from its origin , A2 = R*LS ,
+        x along the tangent at the origin , y toward the curvature . Fresnel integrals
+        by their power series evaluated on all l at once ,
+          x = l*sum (-1)^n t^2n/((4n+1)(2n)!) , y = l*sum (-1)^n t^(2n+1)/((4n+3)(2n+1)!)
+        with t = l^2/(2*A2) , exact to 1e-12 for t < pi/2 '''
+    l = np.asarray( l, dtype=float )
+    t = np.divide( l*l, 2*A2, out=np.zeros_like(l), where=A2>0 )
+    x = np.zeros_like(l) ; y = np.zeros_like(l)
+    a = np.ones_like(l)                          # t^k/k!
+    for k in range( 2*NTERM ):
+        term = (-1)**(k//2) * a/(2*k+1)
+        if k%2==0: x += term
+        else:      y += term
+        a = a*t/(k+1)
+    return l*x, l*y
+
+def SpiralShift( RADIUS, LSPIRAL ):
+    ''' shift p of the arc off the tangent and abscissa k of its center from TS '''
+    (Xs,),(Ys,) = ClothoidXY( [LSPIRAL], RADIUS*LSPIRAL )
+    th = LSPIRAL/(2*RADIUS)
+    return Ys-RADIUS*(1-np.cos(th)), Xs-RADIUS*np.sin(th)
+
+def SpiralLength( RADIUS, P_SHIFT, TOL=1e-9 ):
+    ''' spiral length giving the shift P_SHIFT , p ~ LS^2/24R refined by LS*sqrt(p/p(LS)) '''
+    if P_SHIFT<=0.: return 0.
+    LS = np.sqrt( 24*RADIUS*P_SHIFT )
+    for _ in range(20):
+        p,_ = SpiralShift( RADIUS, LS )
+        LS_ = LS*np.sqrt( P_SHIFT/p )
+        if abs(LS_-LS)<TOL: return float(LS_)
+        LS = LS_
+    return float(LS)
+
+class SpiralCurve( CircularCurve ):
+    ''' symmetric clothoid-arc-clothoid curve TS-SC-CS-ST of the PC-PI-PT alignment ,
+        LSPIRAL : length of each spiral , LSPIRAL=0 is the CircularCurve itself '''
+    KEYPNT = ['TS','SC','PI','CS','ST','ORIGIN','MO']
+    ENDS   = ['SC','CS']
+    def __init__(self, EPSG, ALIGN, RADIUS, LSPIRAL, DIV ):
+        self.LSPIRAL = LSPIRAL
+        super().__init__( EPSG, ALIGN, RADIUS, DIV )
+
+    @PROF.Timed
+    def GenNormArc(self):
+        ''' spiral-arc-spiral in the local frame of TS , x toward PI , y toward the
+            curvature , stations every DIV plus SC and CS '''
+        PAR = self.PAR
+        R,LS,DEFL = PAR.RADIUS, float(self.LSPIRAL), PAR.DEFL
+        PAR['LSPIRAL'] = LS
+        PAR['THETA_S'] = LS/(2*R)                            # spiral angle
+        assert( 2*PAR.THETA_S<DEFL ),'***ERROR*** spirals longer than the deflection allows'
+        (Xs,),(Ys,) = ClothoidXY( [LS], R*LS )                # SC in the TS frame
+        PAR['P_SHIFT'],PAR['K_SHIFT'] = SpiralShift( R, LS )  # arc shift , abscissa of center
+        PAR['TL']      = (R+PAR.P_SHIFT)*np.tan( DEFL/2 ) + PAR.K_SHIFT   # TS-PI = PI-ST
+        PAR['LENARC']  = R*( DEFL-2*PAR.THETA_S )
+        PAR['LENCUR']  = PAR.LENARC + 2*LS
+        pc,pi,pt = list(PAR.ALIGN.coords)
+        assert( LineString( [pi,pc] ).length>=PAR.TL ),'***ERROR** leadin TS too shore!'
+        assert( LineString( [pi,pt] ).length>=PAR.TL ),'***ERROR** leadout ST too shore!'
+        ndiv,rest = divmod(PAR.LENCUR, PAR.DIV)
+        pnt_div = np.linspace(rest/2,PAR.LENCUR-rest/2,num=int(ndiv)+1,endpoint=True )
+        pnts = np.unique( np.concatenate( [ [0.,LS,LS+PAR.LENARC,PAR.LENCUR], pnt_div ] ) )
+        spin,spout = pnts<=LS, pnts>=LS+PAR.LENARC
+        x,y = np.zeros_like(pnts), np.zeros_like(pnts)
+        x[spin],y[spin] = ClothoidXY( pnts[spin], R*LS )
+        phi = PAR.THETA_S + (pnts-LS)/R
+        arc = ~spin & ~spout
+        x[arc] = PAR.K_SHIFT + R*np.sin(phi[arc])
+        y[arc] = R+PAR.P_SHIFT - R*np.cos(phi[arc])
+        xo,yo = ClothoidXY( PAR.LENCUR-pnts[spout], R*LS )  # from ST back toward PI
+        cosD,sinD = np.cos(DEFL),np.sin(DEFL)
+        x[spout] = PAR.TL + PAR.TL*cosD - xo*cosD - yo*sinD
+        y[spout] =          PAR.TL*sinD - xo*sinD + yo*cosD
+        ELEM = np.select( [spin,arc], ['TS-SC','SC-CS'], default='CS-ST' )
+        ELEM[0] = 'TS' if LS>0 else 'SC'
+        dfPNT = pd.DataFrame( { 'cvDist': np.char.mod( '%.3f', pnts ), 
+                                'Name'  : np.char.mod( '%03.0f', pnts ), 'Element': ELEM } )
+        self.gdfPNT = gpd.GeoDataFrame( dfPNT, crs=PAR.EPSG, geometry=gpd.points_from_xy(x,y) )
+        self.LOCAL = { 'SC': (Xs,Ys), 'CS': (PAR.TL*(1+cosD)-Xs*cosD-Ys*sinD, PAR.TL*sinD-Xs*sinD+Ys*cosD),
+                       'ORIGIN': (PAR.K_SHIFT,R+PAR.P_SHIFT) }
+        PAR['PI'] = Point(pi)
+
+    @PROF.Timed
+    def RotTransNormArc(self):
+        ''' local frame onto TS , y to the left of PC->PI on a left turn ( sgDEFL<0 ) '''
+        PAR = self.PAR
+        pc,pi,pt = np.array( PAR.ALIGN.coords )
+        u_in  = (pi-pc)/np.hypot( *(pi-pc) ) ; u_out = (pt-pi)/np.hypot( *(pt-pi) )
+        side  = -1. if PAR.sgDEFL>0. else 1.
+        TS = pi - PAR.TL*u_in
+        def ToMap( x, y ):
+            return ( TS[0] + u_in[0]*x - side*u_in[1]*y, TS[1] + u_in[1]*x + side*u_in[0]*y )
+        xy = shapely.get_coordinates( self.gdfPNT.geometry )
+        self.gdfPNT['geometry'] = gpd.points_from_xy( *ToMap( xy[:,0], xy[:,1] ), crs=PAR.EPSG )
+        PAR['TS'] = Point( TS )
+        PAR['ST'] = Point( pi + PAR.TL*u_out )
+        for pnt,(x,y) in self.LOCAL.items():
+            PAR[pnt] = Point( ToMap( x,y ) )
+        PAR['MO']  = LineString( [PAR.ORIGIN,PAR.PI] ).interpolate(PAR.RADIUS,normalized=False )
+        PROF.Count( 'SpiralCurve.points', len(self.gdfPNT) )
+
+    def PlotText( self ):
+        return f'R = {self.PAR.RADIUS:.3f} m.\nLs = {self.PAR.LSPIRAL:.3f} m.\n'\
+               f'\u03B4 = {self.PAR.DEFLdms}\nLEN = {self.PAR.LENCUR:.3f} m.\n'\
+               f'Ts = {self.PAR.TL:.3f} m\nDivision: {self.PAR.DIV} m.'
+
+###############################################################################
+def CurveAnswer( cc ):
+    ''' JSON-ready parameters and points-on-curve of a CircularCurve '''
+    PAR = cc.PAR
+    xy = shapely.get_coordinates( cc.gdfPNT.geometry )
+    return { 'RADIUS': float(PAR.RADIUS), 'DIV': float(PAR.DIV), 'ROUND_ABOUT': bool(PAR.ROUND_ABOUT),
+             'DEFL_deg': float( np.degrees(PAR.sgDEFL) ), 'DEFLdms': PAR.DEFLdms,
+             'TL': float(PAR.TL), 'LENCUR': float(PAR.LENCUR),
+             **( { 'LSPIRAL': float(PAR.LSPIRAL) } if 'LSPIRAL' in PAR else {} ),
+             **{ k: list( PAR[k].coords[0] ) for k in cc.KEYPNT },
+             'Name': cc.gdfPNT.Name.tolist(), 'cvDist': cc.gdfPNT.cvDist.astype(float).tolist(),
+             'E': xy[:,0].tolist(), 'N': xy[:,1].tolist() }
+
+def ReqBool( REQ, KEY, DEFAULT=False ):
+    ''' JSON boolean KEY of a server request , "false" or 0 is a bad request '''
+    VAL = REQ.get( KEY, DEFAULT )
+    assert( isinstance( VAL, bool ) ),f'***ERROR*** "{KEY}" must be true|false , not {json.dumps(VAL)}'
+    return VAL
+
+def SolveRequest( REQ ):
+    ''' { "align": [[E,N],[E,N],[E,N]], "radius": m, "division": m,
+          "round_about": false, "epsg": "EPSG:32647" } -> CurveAnswer() '''
+    cc = CircularCurve( REQ.get( 'epsg', 'EPSG:32647' ), LineString( REQ['align'] ),
+                        float(REQ['radius']), float(REQ['division']),
+                        ReqBool( REQ, 'round_about' ) )
+    return CurveAnswer( cc )
+
+def ServeJSON( HANDLER, FIN=None, FOUT=None ):
+    ''' server mode : one JSON request per line of FIN ( stdin ) answered by one
+        JSON line HANDLER(request) on FOUT ( stdout ) , "id" of the request echoed ,
+        failures as {"error": ...} . Log messages go to stderr meanwhile '''
+    FIN = sys.stdin if FIN is None else FIN
+    FOUT = sys.stdout if FOUT is None else FOUT
+    for line in FIN:
+        if not line.strip(): continue
+        REQ = None
+        try:
+            REQ = json.loads( line )
+            assert( isinstance( REQ, dict ) ),f'***ERROR*** request must be a JSON object'
+            with contextlib.redirect_stdout( sys.stderr ):
+                ANS = HANDLER( REQ )
+            ANS = json.dumps( { 'id': REQ['id'], **ANS } if 'id' in REQ else ANS )
+        except Exception as e:
+            ANS = { 'error': f'{type(e).__name__}: {e}' }
+            if isinstance( REQ, dict ) and 'id' in REQ: ANS = { 'id': REQ['id'], **ANS }
+            ANS = json.dumps( ANS )
+        FOUT.write( ANS+'\n' )
+        FOUT.flush()
 
 ###############################################################################
 class CLI_CircCurve(CircularCurve):
@@ -170,10 +482,19 @@ if __name__ == "__main__":
                     help='design value of the radius in meter' )
         parser.add_argument( '-d','--division', action='store',type=float,
                     help='desired division of the point-on-curve in meter' )
+        parser.add_argument( '-s','--serve', action='store_true',
+                    help='server mode, JSON lines requests on stdin, answers on stdout :\n'
+                         '{"id":1,"align":[[E,N],[E,N],[E,N]],"radius":300,"division":20}' )
+        parser.add_argument( '--no_plot', action='store_true',
+                    help='print the points only, do not plot ( no matplotlib import )' )
         args = parser.parse_args()
+        if args.serve:
+            ServeJSON( SolveRequest )
+            sys.exit( 0 )
         print(args)
     cc = CLI_CircCurve( args )
-    cc.DoPlot( )
+    if type(args) is dict or not args.no_plot:
+        cc.DoPlot( )
     print( cc.gdfPNT )
     cc.WriteGIS()
     print('@@@@@@@@@@@@@@@@@ end of  CurvePnt @@@@@@@@@@@@@@@@@@@@')
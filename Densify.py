@@ -0,0 +1,43 @@
+#
+# Densify.py : points along a LineString at many distances in one vectorized
+#              pass, shared by EstCurve.py and MakeRoadSect.py
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import numpy as np
+import shapely
+
+def InterpolateXY( LS, dist_m ):
+    ''' coordinates (M,2) at distances dist_m along LS , same as LS.interpolate()
+        per distance ( negative from the end, clamped to the ends ) but by cumulative
+        vertex length + searchsorted, i.e. O(M log N) for long routes of N vertices '''
+    xy = shapely.get_coordinates( LS )
+    seg = np.hypot( *np.diff( xy, axis=0 ).T )
+    cum = np.concatenate( [ [0.], np.cumsum(seg) ] )
+    dist_m = np.asarray( dist_m, dtype=float )
+    dist_m = np.clip( np.where( dist_m<0, dist_m+cum[-1], dist_m ), 0., cum[-1] )
+    i = np.clip( np.searchsorted( cum, dist_m, side='right' )-1, 0, len(seg)-1 )
+    t = np.divide( dist_m-cum[i], seg[i], out=np.zeros_like(dist_m), where=seg[i]>0 )
+    return xy[i] + t[:,None]*( xy[i+1]-xy[i] )
+
+def InterpolatePnts( LS, dist_m ):
+    ''' shapely Points at distances dist_m along LS '''
+    return shapely.points( InterpolateXY( LS, dist_m ) )
+
+def Substrings( LS, beg_m, end_m ):
+    ''' LineStrings of LS from beg_m[k] to end_m[k] ( 0<=beg<end<=length ) , same as
+        shapely.ops.substring() per pair : start point , vertices strictly between ,
+        end point . All pairs as one coordinate array into shapely.linestrings() '''
+    xy = shapely.get_coordinates( LS )
+    cum = np.concatenate( [ [0.], np.cumsum( np.hypot( *np.diff( xy, axis=0 ).T ) ) ] )
+    beg_m = np.asarray( beg_m, dtype=float ) ; end_m = np.asarray( end_m, dtype=float )
+    lo = np.searchsorted( cum, beg_m, side='right' )         # first vertex after beg
+    npnt = np.maximum( np.searchsorted( cum, end_m, side='left' )-lo, 0 ) + 2
+    part = np.repeat( np.arange( len(beg_m) ), npnt )
+    pos = np.arange( len(part) ) - np.repeat( np.cumsum(npnt)-npnt, npnt )   # within part
+    first = pos==0 ; last = pos==npnt[part]-1 ; mid = ~(first|last)
+    coords = np.empty( (len(part),2) )
+    coords[first] = InterpolateXY( LS, beg_m )
+    coords[last]  = InterpolateXY( LS, end_m )
+    coords[mid]   = xy[ lo[part[mid]] + pos[mid]-1 ]
+    return shapely.linestrings( coords, indices=part )
@@ -8,16 +8,22 @@
 import numpy as np
 import pandas as pd
 import geopandas as gpd
-import pyransac3d as pyrsc
 from pathlib import Path
 import shutil
-from skspatial.objects import Vector,Line
+import sys
+import io
+import os
+import argparse
+import contextlib
 from shapely.wkt import dumps,loads
+import shapely
 from shapely import ops,affinity
 from shapely.geometry import LineString,Point
-from pyogrio import read_dataframe
-from CurvePnts import *
+from CurvePnts import CircularCurve, SpiralCurve, SpiralLength, SpiralShift, \
+                      CurveAnswer, ServeJSON, ReqBool
+from Instrument import PROF, GetLogger, SetLogLevel
 
+LOG = GetLogger( 'EstCurve' )
 
 def drop_z(geometry):
     return ops.transform(lambda x, y, z=None: (x, y), geometry)
@@ -28,23 +34,42 @@ def AngLines(line1,line2):
     return dir_vect1.angle_signed( dir_vect2)
 
 def Line2P_Len( p1, p2, Length ):
+    from skspatial.objects import Vector,Line
     dir_vect = Vector.from_points( p1,p2 ) 
     dir_mag = np.linalg.norm(dir_vect)
     unit_vect = dir_vect / dir_mag
     scaled_vector = unit_vect * Length 
     return Line( p1,scaled_vector)
 
+def Cross2D( a, b ):
+    ''' z of the cross product of 2-D vectors ( np.cross of 2-D is deprecated ) '''
+    return a[...,0]*b[...,1] - a[...,1]*b[...,0]
+
+def FitLine2D( xy ):
+    ''' total least squares line , return centroid and unit direction from the first
+        toward the last point '''
+    c = xy.mean(axis=0)
+    _,_,Vt = np.linalg.svd( xy-c, full_matrices=False )
+    u = Vt[0]
+    return c, ( u if np.dot( u, xy[-1]-xy[0] )>=0 else -u )
+
 ########################################################################################
 class EstimateCurve( CircularCurve ):
-    def __init__(self, EPSG, ROAD_SECT, ANALY_DIV=0.5, THRES=0.2, ROUND_ABOUT=False ):
+    def __init__(self, EPSG, ROAD_SECT, ANALY_DIV=0.5, THRES=0.2, ROUND_ABOUT=False,
+                       METHOD='ransac2d', SEED=0, MEMO=None ):
+        ''' METHOD : 'ransac2d' (CircFit, seeded, deterministic) | 'pyransac3d'
+            MEMO   : CurveCache.CurveCache to reuse circle fits of identical input '''
         if ROAD_SECT.has_z: ROAD_SECT=drop_z(ROAD_SECT)
         self.EPSG = EPSG
         self.ROAD_SECT = ROAD_SECT
         self.ANALY_DIV = ANALY_DIV
         self.THRES = THRES
+        self.METHOD = METHOD
+        self.SEED = SEED
+        self.MEMO = MEMO
         CURV_ALIGN,center,radius = self.CreateAlignment()
         super().__init__( self.EPSG ,CURV_ALIGN, radius, 2, ROUND_ABOUT ) 
-        self.ROAD_SECT = gpd.GeoDataFrame( crs=self.EPSG, geometry=[ROAD_SECT,] )
+        self.FIT['RMS'] = self.ModelRMS()
 
     def CreateAlignment(self):
         center,axis,radius = self.FitCircRANSAC()
@@ -54,7 +79,8 @@ class EstimateCurve( CircularCurve ):
         O_PT = Line2P_Len( center[:2], PT.coords[0], radius )
         PC_PT_mid = [ (PC.x+PT.x)/2,(PC.y+PT.y)/2]
         delta = AngLines(O_PC,O_PT)
-        print(f'AXIS = {axis}...,  DELTA = {np.degrees(delta)}')
+        LOG.debug(f'AXIS = {axis}...,  DELTA = {np.degrees(delta)}')
+        self.FIT['DELTA'] = delta
         E = radius/np.cos(delta/2)-radius
         O_PI = Line2P_Len( center[:2], PC_PT_mid, radius+E )
         CURV_ALIGN = LineString([Point(O_PC.to_point()), Point(O_PI.to_point()), Point(O_PT.to_point()) ])
@@ -62,54 +88,330 @@ class EstimateCurve( CircularCurve ):
         #import pdb ; pdb.set_trace()
         return CURV_ALIGN,center,radius
 
+    @PROF.Timed
     def FitCircRANSAC( self ):
+        from CircFit import FitCircRANSAC2D
+        from Densify import InterpolateXY
         LEN = self.ROAD_SECT.length
         pnts = np.linspace( 0, self.ROAD_SECT.length, num=int(LEN/self.ANALY_DIV), endpoint=True )
         dfPnt = pd.DataFrame( pnts, columns=['dist_m'] )
-        def MkPnt(row,ROAD_SECT):
-            return ROAD_SECT.interpolate( row.dist_m, normalized=False )
-        dfPnt['geometry'] = dfPnt.apply( MkPnt, axis=1, result_type='expand', 
-                                                        args=(self.ROAD_SECT,) ) 
+        xy = InterpolateXY( self.ROAD_SECT, pnts )
         #import pdb ; pdb.set_trace()
-        gdfPnt = gpd.GeoDataFrame( dfPnt, crs=self.EPSG, geometry=dfPnt.geometry )
-        pnts3d = np.array([[geom.x,geom.y,0] for geom in gdfPnt.geometry])
-        circ = pyrsc.Circle()
-        center,axis,radius,inliers = circ.fit( pnts3d, thresh=self.THRES, maxIteration=1000 )
+        gdfPnt = gpd.GeoDataFrame( dfPnt, crs=self.EPSG, geometry=shapely.points(xy) )
+        pnts3d = np.column_stack( [ xy, np.zeros(len(xy)) ] )
+        def DoFit():
+            if self.METHOD=='pyransac3d':
+                import pyransac3d as pyrsc
+                circ = pyrsc.Circle()
+                return circ.fit( pnts3d, thresh=self.THRES, maxIteration=1000 )
+            elif self.METHOD=='ransac2d':
+                center,radius,inliers = FitCircRANSAC2D( pnts3d[:,:2], thresh=self.THRES,
+                                                         maxIteration=1000, SEED=self.SEED )
+                return np.append( center, 0. ), np.array([0.,0.,1.]), radius, inliers
+            else:
+                raise ValueError( f'***ERROR*** unknown METHOD "{self.METHOD}"' )
+        if self.MEMO is None:
+            center,axis,radius,inliers = DoFit()
+        else:
+            KEY = self.MEMO.Key( 'EstimateCurve', self.EPSG, xy, self.ANALY_DIV, self.THRES,
+                                 self.METHOD, self.SEED )
+            center,axis,radius,inliers = self.MEMO.Get( KEY, DoFit,
+                DUMP=lambda fit: dict( zip( ['center','axis','radius','inliers'], fit ) ),
+                LOAD=lambda npz: ( npz['center'], npz['axis'], float(npz['radius']),
+                                   npz['inliers'] ) )
         gdfPnt['INLIER'] = gdfPnt.index.isin( inliers )
+        self.gdfPnt = gdfPnt
         gdfInlier = gdfPnt[gdfPnt.INLIER==True].copy().reset_index()
         #import pdb ; pdb.set_trace()
         self.gdfInlier = gdfInlier
+        resid = np.hypot( pnts3d[inliers,0]-center[0], pnts3d[inliers,1]-center[1] )-radius
+        self.FIT = pd.Series( { 'CENTER_x': center[0], 'CENTER_y': center[1], 'RADIUS': radius,
+                                'N_INLIER': len(inliers), 'RMS_INLIER': np.sqrt(np.mean(resid**2)) } )
         return center,axis,radius
 
+    def ModelRMS( self ):
+        ''' RMS distance of the analysis points to the fitted model , tangent-in ,
+            curve points and tangent-out , tangents extended past the road ends ,
+            the same measure for EstimateCurve and EstimateSpiral . A round-about
+            has no tangents , only its points from the first to the last inlier
+            ( the modelled arc ) count , not the legs in and out '''
+        pc,pi,pt = [ np.array(xy) for xy in self.PAR.ALIGN.coords ]
+        xy = shapely.get_coordinates( self.gdfPNT.geometry )
+        pnts = self.gdfPnt
+        if self.PAR.ROUND_ABOUT:
+            s = pnts.dist_m
+            pnts = pnts[ (s>=self.gdfInlier.dist_m.iloc[0]) & (s<=self.gdfInlier.dist_m.iloc[-1]) ]
+        else:
+            L = self.ROAD_SECT.length
+            xy = np.vstack( [ xy[0]  - L*(pi-pc)/np.linalg.norm(pi-pc), xy,
+                              xy[-1] + L*(pt-pi)/np.linalg.norm(pt-pi) ] )
+        resid = shapely.distance( pnts.geometry.values, LineString( xy ) )
+        return np.sqrt( np.mean(resid**2) )
+
+    def GisLayers( self ):
+        gdfROAD = gpd.GeoDataFrame( crs=self.EPSG, geometry=[self.ROAD_SECT,] )
+        return { 'Road': gdfROAD, 'InlierPnt': self.gdfInlier, **super().GisLayers() }
+
     def WriteGIS( self,SUFFIX=None ):
-        print( f'EstimateCureve:WriteGIS(): write {self.PLOT} layer Road/InlierPnt' )
-        if SUFFIX is None: PLT = f'{self.PLOT}.gpkg'
-        else: PLT = f'{self.PLOT}_{SUFFIX}.gpkg'
-        self.ROAD_SECT.to_file( PLT, driver='GPKG', layer='Road' )
-        self.gdfInlier.to_file( PLT, driver='GPKG', layer='InlierPnt' )
+        LOG.info( f'EstimateCureve:WriteGIS(): write {self.PLOT} layer Road/InlierPnt' )
         super().WriteGIS(SUFFIX)
 
+########################################################################################
+class EstimateSpiral( EstimateCurve, SpiralCurve ):
+    def __init__(self, EPSG, ROAD_SECT, ANALY_DIV=0.5, THRES=0.2, METHOD='ransac2d', SEED=0,
+                       MEMO=None, ITER=3 ):
+        ''' spiral-arc-spiral fit of a road section with straight lead-in/lead-out ,
+            circle by RANSAC then Taubin on the SC-CS points , tangents by total least
+            squares on the leads before TS/after ST , spiral length from the mean shift
+            of the circle off both tangents , ITER refinements of TS/SC/CS/ST '''
+        if ROAD_SECT.has_z: ROAD_SECT=drop_z(ROAD_SECT)
+        self.EPSG = EPSG
+        self.ROAD_SECT = ROAD_SECT
+        self.ANALY_DIV = ANALY_DIV
+        self.THRES = THRES
+        self.METHOD = METHOD
+        self.SEED = SEED
+        self.MEMO = MEMO
+        CURV_ALIGN,radius,LSPIRAL = self.FitSpiral( ITER )
+        SpiralCurve.__init__( self, self.EPSG, CURV_ALIGN, radius, LSPIRAL, 2 )
+        self.FIT['DELTA'] = -self.PAR.sgDEFL
+        self.FIT['RMS'] = self.ModelRMS()
+
+    def Rejected( self, RMS_CIRC, P_TOL=0.5 ):
+        ''' reason to take the circular fit instead , None if the spiral fit holds :
+            a shift P_IN/P_OUT not positive , P_IN and P_OUT apart by more than P_TOL
+            of their mean , or RMS not better than RMS_CIRC of EstimateCurve '''
+        p_in,p_out = self.FIT.P_IN, self.FIT.P_OUT
+        if min( p_in,p_out )<=0.:
+            return f'shift P_IN={p_in:.3f} P_OUT={p_out:.3f} not positive'
+        if abs( p_in-p_out )>P_TOL*(p_in+p_out)/2:
+            return f'shift P_IN={p_in:.3f} P_OUT={p_out:.3f} disagree'
+        if self.FIT.RMS>=RMS_CIRC:
+            return f'RMS {self.FIT.RMS:.3f} not better than circle {RMS_CIRC:.3f}'
+        return None
+
+    @PROF.Timed
+    def FitSpiral( self, ITER ):
+        from CircFit import FitCircTaubin
+        center,axis,radius = self.FitCircRANSAC()
+        xy = shapely.get_coordinates( self.gdfPnt.geometry )
+        s = self.gdfPnt.dist_m.to_numpy()
+        sSC,sCS = self.gdfInlier.dist_m.iloc[0], self.gdfInlier.dist_m.iloc[-1]
+        sTS,sST = sSC/2, (sCS+s[-1])/2             # start on the outer half of the leads
+        for it in range( ITER ):
+            assert( (s<=sTS).sum()>=3 and (s>=sST).sum()>=3 ),\
+                        '***ERROR*** no straight lead-in/lead-out before TS/after ST'
+            c_in,u_in = FitLine2D( xy[s<=sTS] )
+            c_out,u_out = FitLine2D( xy[s>=sST] )
+            if it>0:
+                center,radius = FitCircTaubin( xy[(s>=sSC)&(s<=sCS)] )
+            p_in  = abs( Cross2D( u_in,  center[:2]-c_in ) )-radius
+            p_out = abs( Cross2D( u_out, center[:2]-c_out ) )-radius
+            LSPIRAL = SpiralLength( radius, (p_in+p_out)/2 )
+            t = Cross2D( c_out-c_in, u_out )/Cross2D( u_in, u_out )
+            PI = c_in + t*u_in
+            DEFL = abs( np.arctan2( Cross2D( u_in,u_out ), np.dot( u_in,u_out ) ) )
+            p,k = SpiralShift( radius, LSPIRAL )
+            TL = (radius+p)*np.tan( DEFL/2 ) + k
+            sTS = self.ROAD_SECT.project( Point( PI-TL*u_in ) )
+            sST = self.ROAD_SECT.project( Point( PI+TL*u_out ) )
+            sSC,sCS = sTS+LSPIRAL, sST-LSPIRAL
+            LOG.debug( f'FitSpiral() iter {it} : R={radius:.3f} LS={LSPIRAL:.3f} '
+                       f'p_in={p_in:.3f} p_out={p_out:.3f}' )
+        BEG = c_in + np.dot( xy[0]-c_in, u_in )*u_in
+        END = c_out + np.dot( xy[-1]-c_out, u_out )*u_out
+        self.FIT['CENTER_x'],self.FIT['CENTER_y'],self.FIT['RADIUS'] = center[0],center[1],radius
+        self.FIT['LSPIRAL'],self.FIT['P_IN'],self.FIT['P_OUT'] = LSPIRAL,p_in,p_out
+        return LineString( [BEG,PI,END] ),radius,LSPIRAL
+
+##############################################################
+def EstimateSpiralOrCircle( EPSG, ROAD_SECT, THRES=1.0, METHOD='ransac2d', P_TOL=0.5 ):
+    ''' EstimateSpiral() , or EstimateCurve() when the spiral fit fails ( no straight
+        leads ) or is rejected by EstimateSpiral.Rejected( P_TOL ) against the circle '''
+    EC = EstimateCurve( EPSG, ROAD_SECT, THRES=THRES, METHOD=METHOD )
+    try:
+        ES = EstimateSpiral( EPSG, ROAD_SECT, THRES=THRES, METHOD=METHOD )
+    except AssertionError as e:
+        LOG.debug( f'spiral fit failed , circular curve : {e}' )
+        return EC
+    why = ES.Rejected( EC.FIT.RMS, P_TOL )
+    if why is not None:
+        LOG.debug( f'spiral fit rejected , circular curve : {why}' )
+        return EC
+    return ES
+
+def FitOneCurve( job ):
+    ''' worker of BatchEstimate(), job = ( CURVE, EPSG, ROAD_SECT, THRES, ROUND_ABOUT, METHOD,
+        PLOT, GIS, SPIRAL ) , PLOT : None or label spacing in meter of a png-only DoPlot() ,
+        SPIRAL : EstimateSpiralOrCircle() except round-abouts ,
+        return fit row and GisLayers() of the curve if GIS else None '''
+    CURVE,EPSG,ROAD_SECT,THRES,ROUND_ABOUT,METHOD,PLOT,GIS,SPIRAL = job
+    try:
+        with contextlib.redirect_stdout( io.StringIO() ):
+            if SPIRAL and not ROUND_ABOUT:
+                EC = EstimateSpiralOrCircle( EPSG, ROAD_SECT, THRES=THRES, METHOD=METHOD )
+            else:
+                EC = EstimateCurve( EPSG, ROAD_SECT, THRES=THRES, ROUND_ABOUT=ROUND_ABOUT,
+                                    METHOD=METHOD )
+            if PLOT is not None:
+                EC.DoPlot( SUFFIX=f'c{CURVE}', LABEL_SPACING=PLOT, PDF=False )
+    except Exception as e:
+        return { 'CURVE': CURVE, 'ERROR': f'{type(e).__name__}: {e}', 'geometry': None }, None
+    POC = EC.dfLS[EC.dfLS.Type=='POC'].iloc[0].geometry
+    return { 'CURVE': CURVE, **EC.FIT.to_dict(), 'ROUND_ABOUT': ROUND_ABOUT,
+             'ERROR': None, 'geometry': POC }, ( EC.GisLayers() if GIS else None )
+
+def BatchEstimate( gdfROAD, THRES=1.0, ROUND_ABOUT=[], WORKERS=None, CHUNK=16,
+                   METHOD='ransac2d', PLOT=None, GIS=None, SPIRAL=False ):
+    ''' fit every LineString of gdfROAD (projected CRS) in a process pool,
+        return one GeoDataFrame of center/radius/delta/inliers/RMS per curve ,
+        PLOT : label spacing in meter to plot every curve ( png only ) , None no plot
+        GIS  : CurveGPKG.CurveGPKG collecting the GIS layers of every fitted curve
+        SPIRAL : fit spiral-arc-spiral curves , LSPIRAL/P_IN/P_OUT columns added ,
+                 NaN for the curves fitted as circles '''
+    from concurrent.futures import ProcessPoolExecutor
+    EPSG = gdfROAD.crs.to_epsg()
+    jobs = [ ( CURVE, EPSG, geom, THRES, CURVE in ROUND_ABOUT, METHOD, PLOT, GIS is not None,
+               SPIRAL )
+                 for CURVE,geom in zip( gdfROAD.index, gdfROAD.geometry ) ]
+    fits = list()
+    with contextlib.ExitStack() as stack:
+        if WORKERS==1:
+            results = map( FitOneCurve, jobs )
+        else:
+            pool = stack.enter_context( ProcessPoolExecutor( max_workers=WORKERS ) )
+            results = pool.map( FitOneCurve, jobs, chunksize=CHUNK )
+        for fit,LAYERS in results:
+            fits.append( fit )
+            if LAYERS is not None: GIS.AddLayers( fit['CURVE'], LAYERS )
+    df = pd.DataFrame( fits )
+    if SPIRAL:
+        for col in ['LSPIRAL','P_IN','P_OUT']:
+            if col not in df: df[col] = np.nan
+    return gpd.GeoDataFrame( df, crs=EPSG, geometry=df.geometry )
+
+def EstimateRoute( gdfROUTE, LEAD=20., THRES=1.0, WORKERS=None, CHUNK=16,
+                   METHOD='ransac2d', PLOT=None, GIS=None, SPIRAL=False, **kw ):
+    ''' segment whole routes (projected CRS) into tangent/arc by SegmentRoute(kw),
+        fit every arc extended by LEAD m of lead-in/lead-out with BatchEstimate(),
+        ROUND_ABOUT by delta > 180 deg , return gdfSEG, gdfFIT '''
+    from SegRoute import SegmentRoute
+    segs = list()
+    for ROUTE,LS in zip( gdfROUTE.index, gdfROUTE.geometry ):
+        if LS.has_z: LS = drop_z(LS)
+        gdfSEG = SegmentRoute( LS, CRS=gdfROUTE.crs, **kw )
+        gdfSEG.insert( 0, 'ROUTE', ROUTE )
+        gdfSEG['ROAD_SECT'] = [ ops.substring( LS, max(b-LEAD,0), min(e+LEAD,LS.length) )
+                                    for b,e in zip( gdfSEG.BEG_m, gdfSEG.END_m ) ]
+        segs.append( gdfSEG )
+    gdfSEG = pd.concat( segs, ignore_index=True )
+    gdfSEG.index.name = 'SEG'
+    gdfARC = gdfSEG[gdfSEG.TYPE=='ARC']
+    gdfFIT = BatchEstimate( gpd.GeoDataFrame( crs=gdfSEG.crs, geometry=gdfARC.ROAD_SECT ),
+                            THRES=THRES, ROUND_ABOUT=list( gdfARC.index[gdfARC.ROUND_ABOUT] ),
+                            WORKERS=WORKERS, CHUNK=CHUNK, METHOD=METHOD, PLOT=PLOT,
+                            GIS=GIS, SPIRAL=SPIRAL )
+    gdfFIT = gdfFIT.rename( columns={'CURVE':'SEG'} )
+    return gdfSEG.drop( columns='ROAD_SECT' ), gdfFIT
+
+def FitRequest( REQ ):
+    ''' server mode : { "road": [[E,N],...] or "wkt": "LINESTRING (...)", "epsg": 32647,
+        "thres": 1.0, "round_about": false, "method": "ransac2d", "spiral": false }
+        -> fit and curve '''
+    ROAD = loads( REQ['wkt'] ) if 'wkt' in REQ else LineString( REQ['road'] )
+    EPSG = REQ.get( 'epsg', 32647 )
+    kw = dict( THRES=float( REQ.get( 'thres', 1.0 ) ), METHOD=REQ.get( 'method', 'ransac2d' ) )
+    SPIRAL,ROUND_ABOUT = ReqBool( REQ, 'spiral' ), ReqBool( REQ, 'round_about' )
+    if SPIRAL and not ROUND_ABOUT:
+        EC = EstimateSpiralOrCircle( EPSG, ROAD, **kw )
+    else:
+        EC = EstimateCurve( EPSG, ROAD, ROUND_ABOUT=ROUND_ABOUT, **kw )
+    return { **{ k: float(v) for k,v in EC.FIT.items() }, **CurveAnswer( EC ) }
+
 ##############################################################
 ##############################################################
 ##############################################################
 if __name__ == "__main__":
-    if 1:
-        Path('./CACHE_C').mkdir(parents=True, exist_ok=True)
-        df = read_dataframe( 'CurvePrasert.kml' )
+    parser = argparse.ArgumentParser( description='Estimate circular curves from road centerline' )
+    parser.add_argument( 'KML', nargs='?', default='CurvePrasert.kml',
+                help='KML|GPKG of road centerlines, one curve per feature' )
+    parser.add_argument( '-b','--batch', action='store_true',
+                help='fit all curves in a process pool, write one consolidated layer' )
+    parser.add_argument( '-w','--workers', type=int, default=os.cpu_count(),
+                help='number of worker processes in batch mode' )
+    parser.add_argument( '-c','--chunk', type=int, default=16,
+                help='curves submitted per worker task in batch mode' )
+    parser.add_argument( '-t','--thres', type=float, default=1.0,
+                help='RANSAC inlier threshold in meter' )
+    parser.add_argument( '-r','--round_about', type=int, nargs='*', default=None,
+                help='feature indices to be fitted as round-about (>semi-circle)' )
+    parser.add_argument( '-s','--segment', action='store_true',
+                help='features are whole routes, split into tangent/arc and fit every arc' )
+    parser.add_argument( '-m','--method', default='ransac2d', choices=['ransac2d','pyransac3d'],
+                help='circle fitting engine' )
+    parser.add_argument( '-p','--plot', type=float, nargs='?', const=20., default=None,
+                help='batch mode: plot every curve (png), point labels every PLOT meter' )
+    parser.add_argument( '-g','--gis', action='store_true',
+                help='batch mode: GIS layers of every curve into one CACHE/Plot_Curve_<KML>.gpkg' )
+    parser.add_argument( '--profile', nargs='?', const='1', default=None,
+                help='stage timings, summary on exit, or JSON lines into PROFILE file' )
+    parser.add_argument( '--log', default=None, help='log level DEBUG|INFO|WARNING' )
+    parser.add_argument( '--spiral', action='store_true',
+                help='batch/segment mode: fit spiral-arc-spiral curves ( not round-abouts )' )
+    parser.add_argument( '--serve', action='store_true',
+                help='server mode, one JSON request per stdin line, see FitRequest()' )
+    args = parser.parse_args()
+    if args.log: SetLogLevel( args.log )
+    if args.profile: PROF.Enable( args.profile )
+    if args.serve:
+        ServeJSON( FitRequest )
+        sys.exit( 0 )
+    from pyogrio import read_dataframe
+    from CurveGPKG import CurveGPKG
+    if args.round_about is None:   # known round-abouts of the sample file
+        args.round_about = [6,7] if Path(args.KML).name=='CurvePrasert.kml' else []
+    if args.batch or args.segment:
+        df = read_dataframe( args.KML )
+        df = df.to_crs( df.estimate_utm_crs().to_epsg() )
+        df['geometry'] = df.geometry.apply( lambda geom: drop_z(geom) if geom.has_z else geom )
+        Path('./CACHE').mkdir(parents=True, exist_ok=True)
+        GPKG = Path('./CACHE') / f'EstCurve_{Path(args.KML).stem}.gpkg'
+        GIS = CurveGPKG( Path('./CACHE') / f'Plot_Curve_{Path(args.KML).stem}.gpkg' ) \
+                  if args.gis else contextlib.nullcontext()
+        with GIS:
+            if args.segment:
+                gdfSEG,gdfFIT = EstimateRoute( df, THRES=args.thres, WORKERS=args.workers,
+                                    CHUNK=args.chunk, METHOD=args.method, PLOT=args.plot,
+                                    GIS=GIS if args.gis else None, SPIRAL=args.spiral )
+                print( gdfSEG.drop(columns='geometry').to_markdown( floatfmt='.3f' ) )
+                print( f'Writing {GPKG} layer Segment ...' )
+                gdfSEG.to_file( GPKG, driver='GPKG', layer='Segment' )
+            else:
+                gdfFIT = BatchEstimate( df, THRES=args.thres, ROUND_ABOUT=args.round_about,
+                                    WORKERS=args.workers, CHUNK=args.chunk, METHOD=args.method,
+                                    PLOT=args.plot, GIS=GIS if args.gis else None,
+                                    SPIRAL=args.spiral )
+        print( gdfFIT.drop(columns='geometry').to_markdown( floatfmt='.3f' ) )
+        print( f'Writing {GPKG} layer CurveFit ...' )
+        gdfFIT.to_file( GPKG, driver='GPKG', layer='CurveFit' )
+    elif 1:
+        df = read_dataframe( args.KML )
         EPSG = df.estimate_utm_crs().to_epsg()  # UTM
         df = df.to_crs( EPSG )
         #for i in range( 4,5 ):
-        for i in range( len(df)):
-            print(f'============================= i:{i} ==============================')
-            #import pdb ; pdb.set_trace()
-            if i in [6,7]:
-                EC = EstimateCurve(EPSG,df.iloc[i].geometry, THRES=1.0, ROUND_ABOUT=True) # >semi-circle 
-            else:
-                EC = EstimateCurve(EPSG,df.iloc[i].geometry, THRES=1.0 )
-            #print( dumps( drop_z(df.iloc[i].geometry), rounding_precision=7) )
-            #import pdb ; pdb.set_trace()
-            EC.DoPlot(SUFFIX=f'c{i}')
-            EC.WriteGIS(SUFFIX=f'c{i}')
+        with CurveGPKG( Path('./CACHE') / 'Plot_Curve.gpkg' ) as GIS:
+            for i in range( len(df)):
+                print(f'============================= i:{i} ==============================')
+                #import pdb ; pdb.set_trace()
+                if i in args.round_about:
+                    EC = EstimateCurve(EPSG,df.iloc[i].geometry, THRES=args.thres, ROUND_ABOUT=True,
+                                       METHOD=args.method) # >semi-circle 
+                else:
+                    EC = EstimateCurve(EPSG,df.iloc[i].geometry, THRES=args.thres, METHOD=args.method )
+                #print( dumps( drop_z(df.iloc[i].geometry), rounding_precision=7) )
+                #import pdb ; pdb.set_trace()
+                EC.DoPlot(SUFFIX=f'c{i}')
+                GIS.Add( i, EC )     # was EC.WriteGIS(SUFFIX=f'c{i}') , one file per curve
     else:
         WKT = 'LINESTRING (681119.0450817 1527757.4696346, 681119.3968534 1527757.6504096, 681143.6579172 1527756.5851417, 681159.0136977 1527756.6929437, 681173.4631250 1527759.6319443, 681189.6597877 1527767.1997959, 681200.3085576 1527776.5055463, 681208.2744513 1527787.3780785, 681214.6224477 1527799.4765282, 681214.9790651 1527799.4806670, 681220.5513379 1527819.9152865, 681220.9922170 1527833.4072438, 681219.2690322 1527849.8834369, 681216.6632099 1527865.2979926, 681213.7011911 1527880.3589159, 681208.0542947 1527900.6247882)'
         EC = EstimateCurve( 32647 , loads(WKT) )
@@ -0,0 +1,204 @@
+#
+# HorAlign.py : stake a whole horizontal alignment in one pass , the PI polyline
+#               BEGIN-PI1-...-PIn-END with a circular curve of its own radius at every
+#               interior PI ( simple , compound or reverse curves ) . Tangent overlap of
+#               consecutive curves is checked and the stations run on one continuous
+#               chainage over the tangents and arcs .
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import argparse
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from shapely.geometry import LineString
+from pathlib import Path
+from CurvePnts import SolveCurves, ArcXY
+from Instrument import PROF, GetLogger
+
+LOG = GetLogger( 'HorAlign' )
+
+class HorAlignment:
+    def __init__(self, EPSG, PI_LINE, RADIUS, DIV, ROUND_ABOUT=False, STA0=0. ):
+        ''' PI_LINE : LineString or (N,2) array BEGIN-PI1-...-PIn-END , N>=3 vertices
+            RADIUS, ROUND_ABOUT : scalar or one per interior PI ( N-2 )
+            DIV  : station interval in meter , STA0 : chainage of BEGIN '''
+        self.CACHE = Path( './CACHE' )   # created on DoPlot()/WriteGIS() only
+        self.PLOT = self.CACHE.joinpath('Plot_Align')
+        xy = np.asarray( shapely.get_coordinates( PI_LINE ) if isinstance( PI_LINE, LineString )
+                         else PI_LINE, dtype=float )
+        assert( len(xy)>=3 ),'***ERROR*** PI_LINE needs 3 vertices or more'
+        self.EPSG, self.DIV, self.STA0 = EPSG, DIV, STA0
+        self.PI_LINE = LineString( xy )
+        self.SOL = SolveCurves( xy[:-2], xy[1:-1], xy[2:], RADIUS, ROUND_ABOUT )
+        self.dfLEG = self.Tangents( xy )
+        bad = self.dfLEG[ self.dfLEG.TANGENT<-1E-6 ]
+        assert( len(bad)==0 ),f'***ERROR*** tangent overlap on leg(s) {list(bad.index)} : '\
+                              f'{bad.TANGENT.round(3).tolist()} m'
+        self.MakeElements( xy )
+        self.gdfSTA = self.MakeStation( DIV )
+
+    def Tangents( self, xy ):
+        ''' per leg PI(k)-PI(k+1) : the TL taken by the curves at both ends and the
+            tangent left between PT(k) and PC(k+1) , negative is an overlap '''
+        TL = np.concatenate( [ [0.], self.SOL['TL'], [0.] ] )
+        df = pd.DataFrame( { 'LENGTH': np.hypot( *np.diff( xy, axis=0 ).T ),
+                             'TL_BEG': TL[:-1], 'TL_END': TL[1:] } )
+        df.index.name = 'LEG'
+        df['TANGENT'] = df.LENGTH-df.TL_BEG-df.TL_END
+        return df
+
+    @PROF.Timed
+    def MakeElements( self, xy ):
+        ''' TANGENT-ARC-...-ARC-TANGENT , element chainages and per curve dfPAR '''
+        SOL = self.SOL
+        NCRV = len(SOL['TL'])
+        LEN = np.empty( 2*NCRV+1 )
+        LEN[0::2] = self.dfLEG.TANGENT.clip( lower=0. ).to_numpy()
+        LEN[1::2] = SOL['LENCUR']
+        STA_BEG = self.STA0 + np.concatenate( [ [0.], np.cumsum(LEN)[:-1] ] )
+        TYPE = np.where( np.arange(len(LEN))%2==0, 'TANGENT', 'ARC' )
+        self.dfELEM = pd.DataFrame( { 'TYPE': TYPE, 'STA_BEG': STA_BEG, 'STA_END': STA_BEG+LEN,
+                                      'LENGTH': LEN } )
+        self.dfELEM.index.name = 'ELEM'
+        self.TAN_O = np.vstack( [ xy[:1], SOL['PT'] ] )          # tangent starts BEGIN,PT..
+        vc = np.diff( xy, axis=0 )
+        self.TAN_U = vc/np.hypot( *vc.T )[:,None]
+        dfPAR = pd.DataFrame( { 'RADIUS':SOL['RADIUS'], 'ROUND_ABOUT':SOL['ROUND_ABOUT'],
+                    'sgDEFL':SOL['sgDEFL'], 'DEFL':SOL['DEFL'], 'TL':SOL['TL'], 'LENCUR':SOL['LENCUR'],
+                    'STA_PC': STA_BEG[1::2], 'STA_PT': STA_BEG[1::2]+LEN[1::2] } )
+        dfPAR.index.name = 'CURVE'
+        for name in ['PC','PI','PT','ORIGIN','MO']:
+            dfPAR[f'{name}_x'] = SOL[name][:,0] ; dfPAR[f'{name}_y'] = SOL[name][:,1]
+        self.dfPAR = dfPAR
+
+    def Locate( self, STA ):
+        ''' element index and map coordinates of chainages STA ( array ) , all at once '''
+        STA = np.asarray( STA, dtype=float )
+        STA_BEG = self.dfELEM.STA_BEG.to_numpy()
+        elem = np.clip( np.searchsorted( STA_BEG, STA, side='right' )-1, 0, len(STA_BEG)-1 )
+        d = STA-STA_BEG[elem]
+        x,y = np.empty_like(STA), np.empty_like(STA)
+        tan = elem%2==0
+        leg = elem[tan]//2
+        x[tan] = self.TAN_O[leg,0] + d[tan]*self.TAN_U[leg,0]
+        y[tan] = self.TAN_O[leg,1] + d[tan]*self.TAN_U[leg,1]
+        x[~tan],y[~tan] = ArcXY( self.SOL, elem[~tan]//2, d[~tan] )
+        return elem, x, y
+
+    @PROF.Timed
+    def MakeStation( self, DIV ):
+        ''' every DIV meter of chainage plus BEGIN , PC/PT of each curve and END ,
+            Name as km+meter '''
+        dfE = self.dfELEM
+        STA_END = dfE.STA_END.iloc[-1]
+        k0,k1 = np.ceil( self.STA0/DIV ), np.floor( STA_END/DIV )
+        KEY_STA = np.append( dfE.STA_BEG.to_numpy(), STA_END )
+        NCRV = len(self.dfPAR)
+        KEY = np.array( ['BEGIN'] + [ f'{p}{c}' for c in range(NCRV) for p in ('PC','PT') ]
+                        + ['END'], dtype=object )
+        # coincident keys ( zero tangent of a reverse curve ) share one station at the
+        # last of their chainages , so PT0/PC1 falls on the ARC of PC1
+        last = np.append( np.diff(KEY_STA)>1E-6, True )
+        KEY_STA,grp = KEY_STA[last], np.cumsum( last[::-1] )[::-1]
+        grp = len(KEY_STA)-grp                              # key -> index into KEY_STA
+        REG = np.arange( k0,k1+1 )*DIV
+        i = np.clip( np.searchsorted( KEY_STA, REG ), 1, len(KEY_STA)-1 )
+        near = np.minimum( np.abs(REG-KEY_STA[i-1]), np.abs(KEY_STA[i]-REG) )<1E-6
+        STA = np.unique( np.concatenate( [ REG[~near], KEY_STA ] ) )   # exact key chainages
+        elem,x,y = self.Locate( STA )
+        km,rest = np.divmod( STA, 1000. )
+        df = pd.DataFrame( { 'STA': STA,
+                'Name': np.char.add( np.char.mod( '%03.0f+', km ), np.char.mod( '%07.3f', rest ) ),
+                'Element': dfE.TYPE.to_numpy()[elem], 'CURVE': np.where( elem%2==1, elem//2, -1 ) } )
+        beg = np.flatnonzero( np.diff( grp, prepend=-1 ) )         # first key of each station
+        df['Key'] = ''
+        df.loc[ np.searchsorted( STA, KEY_STA ), 'Key' ] = [ k[1:] for k in np.add.reduceat( '/'+KEY, beg ) ]
+        PROF.Count( 'HorAlignment.stations', len(df) )
+        return gpd.GeoDataFrame( df, crs=self.EPSG, geometry=gpd.points_from_xy( x,y ) )
+
+    def ElementLines( self, STEP=1. ):
+        ''' GeoDataFrame of dfELEM , arcs as polylines of chords about STEP meter '''
+        dfE = self.dfELEM
+        npnt = np.where( dfE.TYPE=='ARC', np.ceil( dfE.LENGTH/STEP ), 1 ).astype(int)+1
+        i = np.repeat( np.arange(len(dfE)), npnt )
+        k = np.arange( npnt.sum() ) - np.repeat( np.cumsum(npnt)-npnt, npnt )
+        STA = dfE.STA_BEG.to_numpy()[i] + dfE.LENGTH.to_numpy()[i]*k/(npnt[i]-1)
+        _,x,y = self.Locate( STA )      # element ends are shared , continuous
+        geom = shapely.linestrings( np.column_stack([x,y]), indices=i )
+        return gpd.GeoDataFrame( dfE.reset_index(), crs=self.EPSG, geometry=geom )
+
+    @PROF.Timed
+    def DoPlot( self, SUFFIX=None, LABEL_SPACING=None, PDF=True ):
+        ''' alignment , elements and stations on a bare Agg Figure as CircularCurve.DoPlot() ,
+            LABEL_SPACING : meter of chainage between station labels , None = all '''
+        from matplotlib.figure import Figure       # plotting only , slow to import
+        from matplotlib.collections import LineCollection
+        self.CACHE.mkdir(parents=True, exist_ok=True)
+        fig = Figure( figsize=(20,18) )
+        ax = fig.add_subplot()
+        ax.plot( *shapely.get_coordinates( self.PI_LINE ).T, c='gray', ls='--' )
+        ax.add_collection( LineCollection( [ shapely.get_coordinates(ls)
+                                             for ls in self.ElementLines().geometry ] ) )
+        xy = shapely.get_coordinates( self.gdfSTA.geometry )
+        ax.scatter( xy[:,0], xy[:,1], c='k', s=20, alpha=0.5 )
+        label = np.ones( len(xy), dtype=bool )
+        if LABEL_SPACING is not None:
+            bins = np.floor( self.gdfSTA.STA.to_numpy()/LABEL_SPACING )
+            label[1:] = bins[1:]!=bins[:-1] ; label[-1] = True
+        key = (self.gdfSTA.Key!='').to_numpy()
+        for (x,y),name in zip( xy[label&~key], self.gdfSTA.Name.to_numpy()[label&~key] ):
+            ax.text( x,y, s=name, c='g', fontsize=10 )
+        ax.scatter( xy[key,0], xy[key,1], c='r', s=50 )
+        for (x,y),name,sta in zip( xy[key], self.gdfSTA.Key[key], self.gdfSTA.Name[key] ):
+            ax.text( x,y, s=f'{name}\n{sta}', c='r', fontsize=12 )
+        for i,row in self.dfPAR.iterrows():
+            ax.text( row.PI_x,row.PI_y, s=f'PI{i}\nR = {row.RADIUS:.1f} m.', c='b', fontsize=12 )
+        ax.autoscale_view()
+        ax.tick_params(axis='x', rotation=90)
+        ax.ticklabel_format( useOffset=False, style='plain' )
+        ax.set_aspect('equal')
+        ax.grid()
+        LOG.info(f'HorAlignment:DoPlot() Writing result "{"pdf|" if PDF else ""}png" into ./{self.CACHE}/...')
+        PLT = self.PLOT if SUFFIX is None else f'{self.PLOT}_{SUFFIX}'
+        fig.savefig( f'{PLT}.png' )
+        if PDF: fig.savefig( f'{PLT}.pdf' )
+
+    def GisLayers( self ):
+        ''' layer name -> GeoDataFrame written by WriteGIS() and CurveGPKG '''
+        return { 'Stations': self.gdfSTA, 'Elements': self.ElementLines() }
+
+    @PROF.Timed
+    def WriteGIS( self, SUFFIX=None ):
+        LOG.info(f'HorAlignment:WriteGIS() "gpkg" into ./{self.CACHE}/...')
+        self.CACHE.mkdir(parents=True, exist_ok=True)
+        PLT = f'{self.PLOT}.gpkg' if SUFFIX is None else f'{self.PLOT}_{SUFFIX}.gpkg'
+        for LAYER,gdf in self.GisLayers().items():
+            gdf.to_file( PLT, driver='GPKG', layer=LAYER )
+
+###############################################################################
+if __name__ == "__main__":
+    USAGE = '''python3 HorAlign.py -a [0,0],[400,0],[700,300],[1000,300],[1300,600] -r 300 200 250 -d 20'''
+    parser = argparse.ArgumentParser( description='stake a horizontal alignment of N PIs in one pass',
+                                      usage=USAGE )
+    parser.add_argument( '-a','--align', default='[0,0],[400,0],[700,300],[1000,300],[1300,600]',
+                help='vertices "[E,N],[E,N],..." BEGIN, PI1..PIn, END' )
+    parser.add_argument( '-r','--radius', type=float, nargs='+', default=[300.],
+                help='radius in meter, one for all PIs or one per PI' )
+    parser.add_argument( '-d','--division', type=float, default=20.,
+                help='station interval in meter' )
+    parser.add_argument( '-s','--sta0', type=float, default=0., help='chainage of BEGIN in meter' )
+    parser.add_argument( '-e','--epsg', default='EPSG:32647', help='CRS of the vertices' )
+    parser.add_argument( '--no_plot', action='store_true', help='no plot ( no matplotlib import )' )
+    args = parser.parse_args()
+    xy = np.array( eval( f'[{args.align}]' ), dtype=float )
+    RADIUS = args.radius[0] if len(args.radius)==1 else np.array( args.radius )
+    HA = HorAlignment( args.epsg, xy, RADIUS, args.division, STA0=args.sta0 )
+    print( HA.dfLEG.to_markdown( floatfmt='.3f' ) )
+    print( HA.dfPAR[['RADIUS','DEFL','TL','LENCUR','STA_PC','STA_PT']].to_markdown( floatfmt='.3f' ) )
+    print( HA.gdfSTA[HA.gdfSTA.Key!=''].drop(columns='geometry').to_markdown() )
+    print( f'{len(HA.gdfSTA)} stations over {HA.dfELEM.STA_END.iloc[-1]-args.sta0:.3f} m ...' )
+    if not args.no_plot:
+        HA.DoPlot( LABEL_SPACING=5*args.division )
+    HA.WriteGIS()
@@ -0,0 +1,140 @@
+#
+# Instrument.py : opt-in stage timers/counters and log levels of the curve, section
+#                 and trajectory modules . Off unless env CURVE_PROFILE is set ( or a
+#                 CLI --profile calls PROF.Enable() ) :
+#                   CURVE_PROFILE=1            summary table on exit ( stderr ) , pool
+#                                              workers included by a temporary JSON
+#                                              lines file removed at exit
+#                   CURVE_PROFILE=stage.jsonl  one JSON line per timed call or count ,
+#                                              pool workers included , plus the summary
+#                 Messages go through logging , level by env CURVE_LOG ( default INFO ,
+#                 also for an unknown level ) .
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import tempfile
+import functools
+import contextlib
+import pandas as pd
+from collections import defaultdict
+
+ENV, ENV_RUN, ENV_LOG = 'CURVE_PROFILE', 'CURVE_PROFILE_RUN', 'CURVE_LOG'
+
+class _Stdout( logging.StreamHandler ):
+    ''' writes to the current sys.stdout , so redirect_stdout() still silences '''
+    @property
+    def stream( self ): return sys.stdout
+    @stream.setter
+    def stream( self, value ): pass
+
+_ROOT = logging.getLogger( 'curve' )
+_ROOT.addHandler( _Stdout() )
+_ROOT.propagate = False
+try:
+    _ROOT.setLevel( os.environ.get( ENV_LOG, 'INFO' ).upper() )
+except ValueError:
+    _ROOT.setLevel( 'INFO' )
+    _ROOT.warning( f'{ENV_LOG}={os.environ[ENV_LOG]} unknown , log level INFO' )
+
+def GetLogger( NAME ):
+    ''' logger of module NAME , plain messages on stdout '''
+    return logging.getLogger( f'curve.{NAME}' )
+
+def SetLogLevel( LEVEL ):
+    ''' DEBUG | INFO | WARNING | ERROR , pool workers inherit it by env '''
+    _ROOT.setLevel( LEVEL.upper() )
+    os.environ[ENV_LOG] = LEVEL.upper()
+
+class _Timer:
+    def __init__( self, PROF, STAGE ):
+        self.PROF, self.STAGE = PROF, STAGE
+    def __enter__( self ):
+        self.t0 = time.perf_counter()
+    def __exit__( self, *exc ):
+        self.PROF.Record( self.STAGE, time.perf_counter()-self.t0 )
+
+class Profiler:
+    def __init__( self ):
+        self.ENABLED = False
+        self.OUT = self.FH = self.RUN = self.TEMP = None
+        self.STAT = defaultdict( lambda: [0,0.,0.,0] )   # calls, total sec, max sec, items
+
+    def Enable( self, OUT='1' ):
+        ''' OUT : '1' summary only , or path of the JSON lines file ; set in the
+            environment so that pool workers profile too . For '1' the records of
+            all processes go to a temporary JSON lines file , removed by Report() '''
+        self.RUN = os.environ.setdefault( ENV_RUN, f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}' )
+        if str(OUT)=='1':
+            OUT = self.TEMP = os.path.join( tempfile.gettempdir(), f'curve_profile_{self.RUN}.jsonl' )
+        os.environ[ENV] = str(OUT)
+        self.OUT = str(OUT)
+        if not self.ENABLED and self.RUN.endswith( f'-{os.getpid()}' ):
+            atexit.register( self.Report )     # the process that started the run
+        self.ENABLED = True
+
+    def Timer( self, STAGE ):
+        ''' context manager timing STAGE , nullcontext when disabled '''
+        if not self.ENABLED: return contextlib.nullcontext()
+        return _Timer( self, STAGE )
+
+    def Timed( self, func ):
+        ''' decorator timing every call of func as its __qualname__ '''
+        STAGE = func.__qualname__
+        @functools.wraps( func )
+        def wrapper( *args, **kw ):
+            if not self.ENABLED: return func( *args, **kw )
+            with _Timer( self, STAGE ):
+                return func( *args, **kw )
+        return wrapper
+
+    def Count( self, STAGE, N=1 ):
+        ''' add N items to the counter of STAGE '''
+        if not self.ENABLED: return
+        self.STAT[STAGE][3] += N
+        self.Emit( { 'stage': STAGE, 'items': int(N) } )
+
+    def Record( self, STAGE, SEC ):
+        st = self.STAT[STAGE]
+        st[0] += 1 ; st[1] += SEC ; st[2] = max( st[2], SEC )
+        self.Emit( { 'stage': STAGE, 'sec': SEC } )
+
+    def Emit( self, REC ):
+        if self.OUT is None: return
+        if self.FH is None or self.FH.closed:
+            self.FH = open( self.OUT, 'a', buffering=1 )   # line buffered , append by all pids
+        self.FH.write( json.dumps( { 'run': self.RUN, 'pid': os.getpid(), **REC } )+'\n' )
+
+    def Summary( self ):
+        ''' per stage calls/total/mean/max and items , of all processes of this run
+            from the JSON lines file , else of this process '''
+        if self.OUT is not None and os.path.exists( self.OUT ):
+            if self.FH is not None: self.FH.flush()
+            df = pd.read_json( self.OUT, lines=True )
+            df = df[df.run==self.RUN].reindex( columns=['stage','sec','items'] )
+            grp = df.groupby( 'stage', sort=False )
+            df = pd.DataFrame( { 'calls': grp.sec.count(), 'total_s': grp.sec.sum(),
+                                 'max_s': grp.sec.max(), 'items': grp['items'].sum() } )
+        else:
+            df = pd.DataFrame.from_dict( self.STAT, orient='index',
+                                         columns=['calls','total_s','max_s','items'] )
+        df.index.name = 'stage'
+        df['mean_ms'] = 1000*df.total_s/df.calls.where( df.calls>0 )
+        df['max_ms'] = 1000*df.max_s.where( df.calls>0 )
+        return df[['calls','total_s','mean_ms','max_ms','items']].sort_values( 'total_s', ascending=False )
+
+    def Report( self ):
+        df = self.Summary()
+        if len(df): print( df.to_markdown( floatfmt=('','.0f','.3f','.2f','.2f','.0f') ),
+                           file=sys.stderr )
+        if self.TEMP is not None:
+            if self.FH is not None: self.FH.close()
+            with contextlib.suppress( OSError ): os.unlink( self.TEMP )
+
+PROF = Profiler()
+if os.environ.get( ENV ): PROF.Enable( os.environ[ENV] )
@@ -7,20 +7,38 @@
 import argparse
 import tomllib
 import shutil
+import io
+import zipfile
+import contextlib
 import pyogrio
+import shapely
 import numpy as np
 import pandas as pd
 import geopandas as gpd
-from sklearn.cluster import DBSCAN
 from shapely import to_wkt
 from shapely.geometry import LineString
 from shapely.ops import substring
 from pathlib import Path
-from simplekml import Kml, Style 
-from simplekml import Polygon as kmlPoly
-from itertools import cycle
+from xml.sax.saxutils import escape
+from pyproj import Transformer
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from Densify import InterpolatePnts, Substrings
+from Instrument import PROF, GetLogger, SetLogLevel
 from pathlib import Path
 gpd.options.io_engine = "pyogrio"
+LOG = GetLogger( 'MakeRoadSect' )
+
+KML_COLORS = ['#a6cee3','#1f78b4','#b2df8a','#33a02c','#fb9a99','#e31a1c','#fdbf6f','#ff7f00','#cab2d6','#6a3d9a']
+KML_HEAD = '''<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:gx="http://www.google.com/kml/ext/2.2">
+<Document>
+<name>Sections for MMS Routes</name>
+<visibility>1</visibility>
+<Style id="STA"><IconStyle><color>ff0000ff</color><scale>1</scale><Icon><href>http://maps.google.com/mapfiles/kml/shapes/flag.png</href></Icon></IconStyle><LabelStyle><color>ff0000ff</color><scale>1</scale></LabelStyle></Style>
+<Style id="STA100"><IconStyle><scale>0.5</scale><Icon><href>https://maps.google.com/mapfiles/kml/shapes/placemark_circle.png</href></Icon></IconStyle><LabelStyle><scale>0.5</scale></LabelStyle></Style>
+''' + ''.join( f'<Style id="POLY{i}"><LineStyle><color>{color}</color></LineStyle>'
+                  f'<PolyStyle><color>{color.replace("#","B2")}</color><fill>1</fill><outline>1</outline>'
+                  f'</PolyStyle></Style>\n' for i,color in enumerate(KML_COLORS) )  # opacity 50%
 
 class Section:
     def __init__(self, DATA, LS):
@@ -30,6 +48,7 @@ class Section:
         self.dfSTA100 = self.MakeStation(100)  # for visualization
         self.dfTILE = self.MakeSection()
 
+    @PROF.Timed
     def MakeStation( self, DIV ):
         TRUNCATE = 10  # meter
         ndiv,rest = divmod( self.DATA.START_SECT+self.LS.length ,DIV ) 
@@ -45,32 +64,43 @@ class Section:
         df = df[df.dist_m>=self.DATA.START_SECT].copy()
         df.drop_duplicates( 'dist_m', keep='first', inplace=True, ignore_index=True )
         df['ls_dist'] = df['dist_m']-self.DATA.START_SECT
-        def mkpnt(row, DATA,LS):
-            pnt = LS.interpolate( row.ls_dist ) 
-            km,rest = divmod( row.dist_m,DATA.DIV)
-            sta = f'{int(km):03.0f}+{rest:03.0f}'
-            return sta,pnt
-        df[['Name', 'geometry']] = df.apply( mkpnt, axis=1, result_type='expand',
-                                   args=(self.DATA,self.LS ) )
-        gdf = gpd.GeoDataFrame( df, crs=self.DATA.EPSG, geometry=df.geometry )
+        km,rest = np.divmod( df.dist_m.to_numpy(), self.DATA.DIV )
+        df['Name'] = np.char.add( np.char.mod( '%03.0f+', km ),
+                                  np.char.mod( '%03.0f', rest ) ).astype(object)
+        gdf = gpd.GeoDataFrame( df, crs=self.DATA.EPSG, 
+                                geometry=InterpolatePnts( self.LS, df.ls_dist ) )
+        PROF.Count( 'Section.stations', len(gdf) )
         return gdf
 
+    @PROF.Timed
     def MakeSection( self ):
-        tiles = list()
-        for i in range( len(self.dfSTA)-1 ):
-            fr  = self.dfSTA.iloc[i  ]
-            to  = self.dfSTA.iloc[i+1]
-            buf = self.DATA.BUFFER
-            sect = substring( self.LS, fr.ls_dist, to.ls_dist , normalized=False)
-            geom  = sect.buffer( buf, cap_style='flat' )         
-            tiles.append( [ fr.Name, to.Name, buf, geom  ] )
-        df = pd.DataFrame( tiles, columns=[ 'BEG','END', 'buffer' ,'geometry' ] )      
-        gdf = gpd.GeoDataFrame( df, crs=self.DATA.EPSG, geometry=df.geometry )
+        ''' tiles between consecutive stations , substrings and flat-cap buffers
+            of all tiles in batch '''
+        fr  = self.dfSTA.iloc[:-1]
+        to  = self.dfSTA.iloc[1: ]
+        buf = self.DATA.BUFFER
+        sect = Substrings( self.LS, fr.ls_dist, to.ls_dist )
+        geom = shapely.buffer( sect, buf, quad_segs=16, cap_style='flat' )  # as .buffer()
+        df = pd.DataFrame( { 'BEG': fr.Name.to_numpy(), 'END': to.Name.to_numpy(),
+                             'buffer': buf } )
+        gdf = gpd.GeoDataFrame( df, crs=self.DATA.EPSG, geometry=geom )
         return gdf
 
+def _RouteSection( job ):
+    DATA,LS = job
+    sect = Section( DATA,LS )
+    return sect.dfSTA, sect.dfSTA100, sect.dfTILE
+
+def SameText( FILE, TEXT ):
+    FILE = Path( FILE )
+    return FILE.exists() and FILE.read_text()==TEXT
+
 class MMS_Route:
-    def __init__(self, DATA):
+    def __init__(self, DATA, WORKERS=1 ):
+        ''' WORKERS : 1 serial , None|n routes in a process pool and tile files
+                    in a thread pool of all CPUs|n '''
         self.DATA = DATA
+        self.WORKERS = WORKERS
         self.CACHE = Path('./CACHE')
         self.REP_DIR =  f'{self.CACHE}/{self.DATA.INSTRU}_{self.DATA.ACQ_DATE}'
         self.CACHE.mkdir( parents=True, exist_ok=True)
@@ -78,33 +108,40 @@ class MMS_Route:
 
         gdfCL = self.ReadKML_Valid()
 
-        route = list()
+        jobs = list()
         for i in range(len(gdfCL)):
             if not isinstance( gdfCL.iloc[i].geometry, LineString ):
-                print( gdfCL ); raise '***ERROR*** must be LineString'
+                LOG.error( gdfCL ); raise '***ERROR*** must be LineString'
             LS =  gdfCL.iloc[i].geometry   # current center line 
             LS = LineString([(x, y) for x, y, z in LS.coords])
-            sect = Section( DATA,LS )  #  generate
-            data = {'NAME': gdfCL.iloc[i]['Name'] ,'LS': LS, 'STA':sect.dfSTA, 'STA100':sect.dfSTA100,
-                     'TILE': sect.dfTILE }
+            jobs.append( (DATA,LS) )
+        if WORKERS==1:
+            sects = map( _RouteSection, jobs )  #  generate
+        else:
+            with ProcessPoolExecutor( max_workers=WORKERS ) as pool:
+                sects = list( pool.map( _RouteSection, jobs ) )
+        route = list()
+        for i,((_,LS),(STA,STA100,TILE)) in enumerate( zip( jobs, sects ) ):
+            data = {'NAME': gdfCL.iloc[i]['Name'] ,'LS': LS, 'STA':STA, 'STA100':STA100,
+                     'TILE': TILE }
             route.append(data)
         self.dfROUTE = pd.DataFrame( route )
         for rt,row in self.dfROUTE.iterrows():
-            print( f'{30*"="} route : "{row.NAME}" {30*"="}')
-            print( row.STA )
+            LOG.info( f'{30*"="} route : "{row.NAME}" {30*"="}')
+            LOG.debug( row.STA )
     
     def ReadKML_Valid(self):
         gdfCL = pyogrio.read_dataframe( self.DATA.CL_KML )
         self.DATA['EPSG'] = gdfCL.estimate_utm_crs() # auto utm
         gdfCL = gdfCL.to_crs( self.DATA.EPSG )
         gdfCL['Length'] = gdfCL.length
-        print( '============ KML of MMS runs ============')
-        print( gdfCL )
-        print( 'KML: must have Name = { FWD | REV } and LINESTRING().....***')
-        print( f'KML: lengths std = {gdfCL.Length.std():.1f} m')
+        LOG.info( '============ KML of MMS runs ============')
+        LOG.info( gdfCL )
+        LOG.info( 'KML: must have Name = { FWD | REV } and LINESTRING().....***')
+        LOG.info( f'KML: lengths std = {gdfCL.Length.std():.1f} m')
         if 'LS_FLIP' in self.DATA.keys(): 
             for route in self.DATA.LS_FLIP:
-                print( f'Found LS_FLIP , flipping "{route}" ...' )
+                LOG.info( f'Found LS_FLIP , flipping "{route}" ...' )
                 idx = gdfCL[gdfCL.Name==route].index[0]
                 flipLS = gdfCL[gdfCL.Name==route].iloc[0].geometry.reverse()
                 gdfCL.at[ idx,'geometry'] = flipLS
@@ -112,62 +149,67 @@ class MMS_Route:
         for i in range( len(gdfCL) ):
             begs.append( gdfCL.iloc[i].geometry.coords[0] )
             ends.append( gdfCL.iloc[i].geometry.coords[-1] )
+        from sklearn.cluster import DBSCAN   # slow to import , this check only
         clust_beg = DBSCAN( eps=200, min_samples=2).fit( np.array(begs) )
         clust_end = DBSCAN( eps=200, min_samples=2).fit( np.array(ends) )
-        print(  'Check if begin/end nodes are clustered!...')
-        print( f'Check begin nodes are clustered : {np.all(clust_beg.labels_==0)}...')
-        print( f'Check end   nodes are clustered : {np.all(clust_end.labels_==0)}...')
+        LOG.info(  'Check if begin/end nodes are clustered!...')
+        LOG.info( f'Check begin nodes are clustered : {np.all(clust_beg.labels_==0)}...')
+        LOG.info( f'Check end   nodes are clustered : {np.all(clust_end.labels_==0)}...')
         return gdfCL
 
-    def PlotKML( self ):
-        kml = Kml(name="Sections for MMS Routes", visibility=1 )
-        STA = Style()
-        STA.labelstyle.scale = 1  # Text twice as big
-        STA.labelstyle.color = 'ff0000ff' 
-        STA.iconstyle.color = 'ff0000ff'  
-        STA.iconstyle.scale = 1  # Icon thrice as big
-        STA.iconstyle.icon.href = 'http://maps.google.com/mapfiles/kml/shapes/flag.png'
-        STA100 = Style()
-        STA100.labelstyle.scale = 0.5  # Text twice as big
-        STA100.iconstyle.scale  = 0.5  # Icon thrice as big
-        STA100.iconstyle.icon.href = 'https://maps.google.com/mapfiles/kml/shapes/placemark_circle.png'
-        colors = ['#a6cee3','#1f78b4','#b2df8a','#33a02c','#fb9a99','#e31a1c','#fdbf6f','#ff7f00','#cab2d6','#6a3d9a']
-        poly_cyc = list()
-        for i in range( len(colors) ):
-            POLY = Style()
-            POLY.linestyle.color = colors[i]
-            POLY.polystyle.color = colors[i].replace('#','B2')  # opacity 50%
-            POLY.polystyle.fill = 1  
-            POLY.polystyle.outline = 1 
-            poly_cyc.append( POLY )
-        #import pdb ; pdb.set_trace()
-        POLY_CYC = cycle(poly_cyc)
-
+    @PROF.Timed
+    def PlotKML( self, KMZ=False ):
+        ''' ROUTE_SECTIONS.kml ( .kmz if KMZ ) : folder per route of Section polygons ,
+            STATION and Sta100 points . Styles are written once , coordinates of all
+            layers go to CRS84 in one pyproj call and placemarks are streamed out '''
+        parts = list()     # tile rings , STA , STA100 of each route in writing order
         for i,row in self.dfROUTE.iterrows():
-            fold_name = kml.newfolder( name=row['NAME'])
-            fold_sect = fold_name.newfolder( name='Section')
-            tile_w84 = row.TILE.to_crs( crs='OGC:CRS84' ).copy()
-            for i,tile in tile_w84.iterrows():
-                coords =  [ [point[0],point[1]] for point in tile.geometry.exterior.coords]
-                poly = fold_sect.newpolygon( name=f'{tile.BEG}-{tile.END}', outerboundaryis=coords)
-                poly.style = next(POLY_CYC)
-            fol_sta = fold_name.newfolder( name='STATION', visibility=1 )
-            sta = row.STA.to_crs( crs='OGC:CRS84' ).copy()
-            for i,rw in sta.iterrows():
-                pnt = fol_sta.newpoint( name=rw['Name'], coords=[(rw.geometry.x,rw.geometry.y)] )
-                pnt.style = STA
-            fol_sta100 = fold_name.newfolder( name='Sta100', visibility=0 )
-            sta100 = row.STA100.to_crs( crs='OGC:CRS84' ).copy()
-            for i,rw in sta100.iterrows():
-                pnt = fol_sta100.newpoint( name=rw['Name'], coords=[(rw.geometry.x,rw.geometry.y)] )
-                pnt.style = STA100
-        MMS_Sections = Path( self.REP_DIR ) / 'ROUTE_SECTIONS.kml' 
-        print( f'Plotting {MMS_Sections} ...' )
-        kml.save( MMS_Sections )
+            parts += [ shapely.get_coordinates( shapely.get_exterior_ring( row.TILE.geometry.values ) ),
+                       shapely.get_coordinates( row.STA.geometry.values ),
+                       shapely.get_coordinates( row.STA100.geometry.values ) ]
+        xy = np.concatenate( parts )
+        lon,lat = Transformer.from_crs( self.DATA.EPSG, 'OGC:CRS84', always_xy=True ).transform( *xy.T )
+        LONLAT = np.char.add( np.char.mod( '%.9f,', lon ), np.char.mod( '%.9f,0', lat ) )
+
+        MMS_Sections = Path( self.REP_DIR ) / ( 'ROUTE_SECTIONS.kmz' if KMZ else 'ROUTE_SECTIONS.kml' )
+        LOG.info( f'Plotting {MMS_Sections} ...' )
+        with contextlib.ExitStack() as stack:
+            if KMZ:
+                kmz = stack.enter_context( zipfile.ZipFile( MMS_Sections, 'w', zipfile.ZIP_DEFLATED ) )
+                fd = stack.enter_context( io.TextIOWrapper( kmz.open( 'doc.kml', 'w' ), encoding='utf-8' ) )
+            else:
+                fd = stack.enter_context( open( MMS_Sections, 'w', encoding='utf-8' ) )
+            fd.write( KML_HEAD )
+            beg = 0 ; npoly = 0
+            for i,row in self.dfROUTE.iterrows():
+                fd.write( f'<Folder><name>{escape(row.NAME)}</name>\n<Folder><name>Section</name>\n' )
+                nring = shapely.get_num_coordinates( shapely.get_exterior_ring( row.TILE.geometry.values ) )
+                for BEG,END,n in zip( row.TILE.BEG, row.TILE.END, nring ):
+                    fd.write( f'<Placemark><name>{BEG}-{END}</name>'
+                              f'<styleUrl>#POLY{npoly%len(KML_COLORS)}</styleUrl><Polygon><outerBoundaryIs>'
+                              f'<LinearRing><coordinates>{" ".join(LONLAT[beg:beg+n])}</coordinates>'
+                              f'</LinearRing></outerBoundaryIs></Polygon></Placemark>\n' )
+                    beg += n ; npoly += 1
+                fd.write( '</Folder>\n' )
+                for FOLDER,VIS,STYLE,STA in [ ('STATION',1,'STA',row.STA), ('Sta100',0,'STA100',row.STA100) ]:
+                    fd.write( f'<Folder><name>{FOLDER}</name><visibility>{VIS}</visibility>\n' )
+                    for NAME,LL in zip( STA.Name, LONLAT[beg:beg+len(STA)] ):
+                        fd.write( f'<Placemark><name>{NAME}</name><styleUrl>#{STYLE}</styleUrl>'
+                                  f'<Point><coordinates>{LL}</coordinates></Point></Placemark>\n' )
+                    beg += len(STA)
+                    fd.write( '</Folder>\n' )
+                fd.write( '</Folder>\n' )
+            fd.write( '</Document>\n</kml>\n' )
 
+    @PROF.Timed
     def MakeFileStruct(self):
-        def epsg_fn():
-            return f'EPSG_{self.DATA.EPSG.to_epsg()}'
+        ''' report files , PntCloud/ tiles .bnd|.las and Images/ tile folders .
+            EPSG WKT and tile bounds as text are made once , a tile whose .bnd
+            exists with identical bounds ( and for Images/ the same img*.jpg
+            numbering ) is skipped ( .bnd is written last ) ,
+            the tile writes run in a thread pool unless WORKERS==1 '''
+        EPSG_FN  = f'EPSG_{self.DATA.EPSG.to_epsg()}'
+        EPSG_WKT = f'{self.DATA.EPSG.to_wkt(pretty=True)}'
         REP_DIR = self.REP_DIR
         Path(REP_DIR).mkdir(parents=True, exist_ok=True)
         for rep in ['Trajectory.out', 'Trajectory.csv', 'Trajectory.trj', 'MMS_MissionReport.pdf' ]:
@@ -176,50 +218,80 @@ class MMS_Route:
         shutil.copy( self.DATA.CL_KML , Path( f'{REP_DIR}/{self.DATA.CL_KML}' )  )
 
         PNC_DIR =  f'{self.CACHE}/{self.DATA.INSTRU}_{self.DATA.ACQ_DATE}/PntCloud'
+        IMG_DIR =  f'{self.CACHE}/{self.DATA.INSTRU}_{self.DATA.ACQ_DATE}/Images'
         Path(PNC_DIR).mkdir(parents=True, exist_ok=True)
-        for i,row_rt in self.dfROUTE.iterrows():
-            with open( f'{PNC_DIR}/{epsg_fn()}.wkt',"w") as fd:
-                fd.write( f'{self.DATA.EPSG.to_wkt(pretty=True)}' )
-            for j,row_tile in row_rt.TILE.iterrows():
-                TILE_NAME = f'{PNC_DIR}/{row_tile.BEG}_{row_tile.END}_{row_rt.NAME}'
-                print( f'Writing PNTCLOUD {TILE_NAME} wkt|bnd|las ...' )
-                with open( f'{TILE_NAME}.bnd', "w") as fd:
-                    fd.write( to_wkt( row_tile.geometry, rounding_precision=2, trim=False ) )
-                Path(f'{TILE_NAME}.las').touch()
+        Path(IMG_DIR).mkdir(parents=True, exist_ok=True)
+        if not SameText( f'{PNC_DIR}/{EPSG_FN}.wkt', EPSG_WKT ):
+            with open( f'{PNC_DIR}/{EPSG_FN}.wkt',"w") as fd:
+                fd.write( EPSG_WKT )
 
-        IMG_DIR =  f'{self.CACHE}/{self.DATA.INSTRU}_{self.DATA.ACQ_DATE}/Images'
+        def PntCloudTile( TILE_NAME, BND ):
+            if SameText( f'{TILE_NAME}.bnd', BND ) and Path(f'{TILE_NAME}.las').exists():
+                return False
+            LOG.debug( f'Writing PNTCLOUD {TILE_NAME} bnd|las ...' )
+            Path(f'{TILE_NAME}.las').touch()
+            with open( f'{TILE_NAME}.bnd', "w") as fd:
+                fd.write( BND )
+            return True
+
+        def ImageTile( IMG_DIR_TILE, BND, PANO_CNT ):
+            IMGS = { f'img{PANO_CNT+k:05d}.jpg' for k in range(5) }
+            HAVE = { p.name for p in Path(IMG_DIR_TILE).glob( 'img*.jpg' ) }
+            if SameText( f'{IMG_DIR_TILE}/{EPSG_FN}.bnd', BND ) and HAVE==IMGS:
+                return False
+            Path(IMG_DIR_TILE).mkdir(parents=True, exist_ok=True)
+            LOG.debug( f'Writing IMAGES {IMG_DIR_TILE}/xxxxx.jpg ..' )
+            with open( f'{IMG_DIR_TILE}/{EPSG_FN}.wkt',"w") as fd:
+                fd.write( EPSG_WKT )
+            for img in HAVE-IMGS:             # numbering shifted by tiles before
+                Path( f'{IMG_DIR_TILE}/{img}' ).unlink()
+            for img in IMGS:
+                Path( f'{IMG_DIR_TILE}/{img}' ).touch()
+            with open( f'{IMG_DIR_TILE}/{EPSG_FN}.bnd',"w") as fd:
+                fd.write( BND )
+            return True
+
+        jobs = list()
         PANO_CNT = 1 
-        Path(IMG_DIR).mkdir(parents=True, exist_ok=True)
         for i,row_rt in self.dfROUTE.iterrows():
-            for j,row_tile in row_rt.TILE.iterrows():
-                IMG_DIR_TILE = f'{IMG_DIR}/{row_tile.BEG}_{row_tile.END}_{row_rt.NAME}'
-                Path(IMG_DIR_TILE).mkdir(parents=True, exist_ok=True)
-                print( f'Writing IMAGES {IMG_DIR_TILE}/xxxxx.jpg ..' )
-                #import pdb ; pdb.set_trace()
-                with open( f'{IMG_DIR_TILE}/{epsg_fn()}.wkt',"w") as fd:
-                    fd.write( f'{self.DATA.EPSG.to_wkt(pretty=True)}' )
-                with open( f'{IMG_DIR_TILE}/{epsg_fn()}.bnd',"w") as fd:
-                    fd.write( to_wkt( row_tile.geometry, rounding_precision=2, trim=False ) )
-                for k in range(5):
-                    JPG = f'{IMG_DIR_TILE}/img{PANO_CNT:05d}.jpg'
-                    print( f'Toching .... {JPG}' )
-                    Path(JPG).touch()
-                    PANO_CNT += 1
+            BNDS = to_wkt( row_rt.TILE.geometry.values, rounding_precision=2, trim=False )
+            for BEG,END,BND in zip( row_rt.TILE.BEG, row_rt.TILE.END, BNDS ):
+                TILE = f'{BEG}_{END}_{row_rt.NAME}'
+                jobs.append( ( PntCloudTile, f'{PNC_DIR}/{TILE}', BND ) )
+                jobs.append( ( ImageTile, f'{IMG_DIR}/{TILE}', BND, PANO_CNT ) )
+                PANO_CNT += 5
+        run = lambda job: job[0]( *job[1:] )
+        if self.WORKERS==1:
+            done = list( map( run, jobs ) )
+        else:
+            with ThreadPoolExecutor( max_workers=self.WORKERS ) as pool:
+                done = list( pool.map( run, jobs ) )
+        LOG.info( f'Tiles written : {sum(done)} , skipped ( same bounds ) : {len(done)-sum(done)} ...' )
+        PROF.Count( 'MMS_Route.tiles_written', sum(done) )
+        PROF.Count( 'MMS_Route.tiles_skipped', len(done)-sum(done) )
 
 ###############################################################################
 if __name__=="__main__":
     parser = argparse.ArgumentParser(
             description="Make MMS sections every 1-km, output CACHCE/* structure. ")
     parser.add_argument("toml", help="specified TOML file, KML file define fwd/rev MMS routes" )
+    parser.add_argument("--kmz", action="store_true", help="zipped ROUTE_SECTIONS.kmz instead of .kml" )
+    parser.add_argument("-w","--workers", type=int, default=1,
+            help="1 serial , 0 all CPUs , n routes/tile files in pools of n workers" )
+    parser.add_argument("--profile", nargs='?', const='1', default=None,
+            help="stage timings, summary on exit, or JSON lines into PROFILE file" )
+    parser.add_argument("--log", default=None, help="log level DEBUG|INFO|WARNING" )
     args = parser.parse_args()
+    if args.log: SetLogLevel( args.log )
+    if args.profile: PROF.Enable( args.profile )
 
     toml_file = Path( args.toml )
     with open( toml_file ,'rb' ) as f:
         #import pdb ; pdb.set_trace()
         TOML = pd.Series( tomllib.load(f) )
         TOML['CL_KML'] = toml_file.with_suffix('.kml')
-    mms =  MMS_Route( TOML )
+    mms =  MMS_Route( TOML, WORKERS=args.workers or None )
     mms.MakeFileStruct()
-    mms.PlotKML()
+    mms.PlotKML( KMZ=args.kmz )
     print('************ end of RoadTile *************' ) 
     #import pdb ; pdb.set_trace()
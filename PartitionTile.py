@@ -0,0 +1,211 @@
+#
+# PartitionTile.py : split MMS point clouds and images into the tiles made by
+#               MakeRoadSect.py . STRtree over the tile polygons , LAS points are
+#               streamed in chunks ( laspy ) and images are placed by the trajectory
+#               position at their exposure time .
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import argparse
+import shutil
+import tomllib
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+from pathlib import Path
+from pyproj import CRS, Transformer
+from Instrument import PROF, GetLogger
+
+LOG = GetLogger( 'PartitionTile' )
+
+def EncodeLAS( pnts, HDR, XY=None ):
+    ''' LAS points pnts as records of a file with header HDR , X,Y,Z re-encoded by
+        the scales/offsets of HDR when they differ , XY : coordinates x,y to write
+        instead of those of pnts ( reprojected ) '''
+    import laspy
+    assert( pnts.point_format==HDR.point_format ),\
+            f'***ERROR*** point format {pnts.point_format.id} of a LAS file differs '\
+            f'from {HDR.point_format.id} of the tile file'
+    if XY is None and np.array_equal( pnts.scales, HDR.scales ) and \
+                      np.array_equal( pnts.offsets, HDR.offsets ):
+        return pnts
+    x,y = ( pnts.x,pnts.y ) if XY is None else XY
+    z = np.asarray( pnts.z )
+    out = laspy.ScaleAwarePointRecord.zeros( len(pnts), header=HDR )
+    for dim in pnts.point_format.dimension_names:
+        if dim not in ( 'X','Y','Z' ): out[dim] = pnts[dim]
+    out.x, out.y, out.z = x, y, z
+    return out
+
+def ReadTiles( PNC_DIR ):
+    ''' dfROUTE ( NAME, TILE ) and CRS of the tiles already written by
+        MMS_Route.MakeFileStruct() , from {PNC_DIR}/*.bnd and EPSG_*.wkt . Routes
+        are ordered by name , tiles by BEG '''
+    WKT = list( Path(PNC_DIR).glob( 'EPSG_*.wkt' ) )
+    assert( len(WKT)==1 ),f'***ERROR*** no EPSG_*.wkt in {PNC_DIR} , run MakeRoadSect.py first'
+    EPSG = CRS.from_wkt( WKT[0].read_text() )
+    tiles = list()
+    for BND in sorted( Path(PNC_DIR).glob( '*.bnd' ) ):
+        BEG,END,NAME = BND.stem.split( '_', 2 )
+        tiles.append( { 'NAME': NAME, 'BEG': BEG, 'END': END,
+                        'geometry': shapely.from_wkt( BND.read_text() ) } )
+    assert( len(tiles) ),f'***ERROR*** no tile *.bnd in {PNC_DIR}'
+    dfTILE = gpd.GeoDataFrame( tiles, crs=EPSG )
+    dfROUTE = pd.DataFrame( [ { 'NAME': NAME, 'TILE': grp.drop( columns='NAME' ).reset_index( drop=True ) }
+                              for NAME,grp in dfTILE.groupby( 'NAME' ) ] )
+    return dfROUTE, EPSG
+
+class TilePartition:
+    def __init__(self, dfROUTE, EPSG, ROUTE=None, CELL=50. ):
+        ''' tiles of dfROUTE ( MMS_Route.dfROUTE ) of all routes or route name ROUTE ,
+            TILE name as the PntCloud/Images entries of MakeFileStruct() ,
+            CELL : meter , grid cell for the coarse STRtree query of Assign() '''
+        tiles = [ row.TILE.assign( NAME=row.NAME ) for _,row in dfROUTE.iterrows()
+                                                   if ROUTE in (None,row.NAME) ]
+        assert( len(tiles) ),f'***ERROR*** no route "{ROUTE}"'
+        self.TILE = pd.concat( tiles, ignore_index=True )
+        self.TILE['TILE'] = self.TILE.BEG+'_'+self.TILE.END+'_'+self.TILE.NAME
+        self.EPSG = EPSG
+        self.CELL = CELL
+        self.GEOM = self.TILE.geometry.values.copy()
+        shapely.prepare( self.GEOM )
+        self.TREE = shapely.STRtree( self.GEOM )
+
+    @PROF.Timed
+    def Assign( self, x, y ):
+        ''' index of the tile covering each point (x,y) , the first tile where tiles
+            touch or overlap , -1 outside all tiles . Points are binned into CELL
+            grid cells , only the cell boxes query the STRtree and each candidate
+            tile tests its points by intersects_xy() on the prepared polygon '''
+        x = np.asarray( x, dtype=float ) ; y = np.asarray( y, dtype=float )
+        NTILE = len(self.TILE)
+        idx = np.full( len(x), NTILE )
+        if len(x)==0: return idx
+        ix = np.floor( (x-x.min())/self.CELL ).astype(np.int64)
+        iy = np.floor( (y-y.min())/self.CELL ).astype(np.int64)
+        key = ix*(iy.max()+1) + iy
+        order = np.argsort( key, kind='stable' )
+        ukey,beg = np.unique( key[order], return_index=True )
+        end = np.append( beg[1:], len(order) )
+        cx,cy = ukey//(iy.max()+1), ukey%(iy.max()+1)
+        boxes = shapely.box( x.min()+cx*self.CELL, y.min()+cy*self.CELL,
+                             x.min()+(cx+1)*self.CELL, y.min()+(cy+1)*self.CELL )
+        i_cell,i_tile = self.TREE.query( boxes )
+        srt = np.argsort( i_tile, kind='stable' )
+        i_cell,i_tile = i_cell[srt],i_tile[srt]
+        tiles,tbeg = np.unique( i_tile, return_index=True )
+        tend = np.append( tbeg[1:], len(i_tile) )
+        for t,b,e in zip( tiles,tbeg,tend ):
+            pi = np.concatenate( [ order[beg[c]:end[c]] for c in i_cell[b:e] ] )
+            pi = pi[ shapely.intersects_xy( self.GEOM[t], x[pi], y[pi] ) ]
+            idx[pi] = np.minimum( idx[pi], t )
+        idx[ idx==NTILE ] = -1
+        return idx
+
+    def PartitionLAS( self, LAS_FILES, PNC_DIR, CHUNK=1_000_000, SRC_EPSG=None ):
+        ''' stream LAS_FILES ( same point format ) CHUNK points at a time into
+            {PNC_DIR}/{TILE}.las , a tile file is created ( placeholder replaced ) on
+            its first points of this run and appended afterwards , so memory is
+            bounded by CHUNK . Points of a later LAS file with other scales/offsets
+            are re-encoded into the header of the tile file . SRC_EPSG : CRS of the
+            points if not the tiles' EPSG , the tile files are then written in the
+            tiles' EPSG ( x,y reprojected , z as is ) .
+            return number of points per tile , OUTSIDE for the rest '''
+        import laspy
+        ToTile = None if SRC_EPSG is None else \
+                 Transformer.from_crs( SRC_EPSG, self.EPSG, always_xy=True )
+        Path(PNC_DIR).mkdir( parents=True, exist_ok=True )
+        count = np.zeros( len(self.TILE)+1, dtype=np.int64 )   # last : outside
+        HDR = dict()                                            # tile : header of its file
+        for LAS in LAS_FILES:
+            LOG.info( f'Partitioning {LAS} ...' )
+            with laspy.open( LAS ) as reader:
+                for pnts in reader.chunk_iterator( CHUNK ):
+                    x,y = np.asarray( pnts.x ), np.asarray( pnts.y )
+                    if ToTile is not None: x,y = ToTile.transform( x,y )
+                    idx = self.Assign( x,y )
+                    count += np.bincount( np.where( idx<0, len(self.TILE), idx ),
+                                          minlength=len(count) )
+                    order = np.argsort( idx, kind='stable' )
+                    tiles,beg = np.unique( idx[order], return_index=True )
+                    end = np.append( beg[1:], len(order) )
+                    for k,b,e in zip( tiles,beg,end ):
+                        if k<0: continue
+                        OUT = Path(PNC_DIR) / f'{self.TILE.TILE.iloc[k]}.las'
+                        sel = order[b:e]
+                        XY = None if ToTile is None else ( x[sel],y[sel] )
+                        if k in HDR:
+                            with laspy.open( OUT, mode='a' ) as app:
+                                app.append_points( EncodeLAS( pnts[sel], HDR[k], XY ) )
+                        else:
+                            HDR[k] = reader.header if ToTile is None else \
+                                     self.TileHeader( k, reader.header )
+                            with laspy.open( OUT, mode='w', header=HDR[k] ) as wrt:
+                                wrt.write_points( EncodeLAS( pnts[sel], HDR[k], XY ) )
+        return pd.Series( count, index=list(self.TILE.TILE)+['OUTSIDE'] )
+
+    def TileHeader( self, k, SRC ):
+        ''' LAS header of tile k for points reprojected from header SRC , same
+            point format , mm scale of x,y offset at the tile corner , tiles' CRS '''
+        import laspy
+        HDR = laspy.LasHeader( point_format=SRC.point_format, version=SRC.version )
+        x0,y0,_,_ = self.GEOM[k].bounds
+        HDR.scales  = np.array( [ 0.001, 0.001, SRC.scales[2] ] )
+        HDR.offsets = np.array( [ np.floor(x0), np.floor(y0), SRC.offsets[2] ] )
+        HDR.add_crs( CRS( self.EPSG ) )
+        return HDR
+
+    def PartitionImages( self, dfIMG, dfTRJ, IMG_DIR=None, TIME_TOL=1.0 ):
+        ''' dfIMG : FILE, GPSTime of exposure ; dfTRJ : GPSTime, Latitude, Longitude .
+            image position by linear interpolation of the trajectory in time , TILE
+            of each image ( '' outside the tiles or farther than TIME_TOL sec from a
+            trajectory epoch ) . Images are copied into {IMG_DIR}/{TILE}/ if given '''
+        dfTRJ = dfTRJ.sort_values( by='GPSTime' )
+        t_trj = dfTRJ.GPSTime.to_numpy( dtype=float )
+        t = dfIMG.GPSTime.to_numpy( dtype=float )
+        lon = np.interp( t, t_trj, dfTRJ.Longitude.to_numpy() )
+        lat = np.interp( t, t_trj, dfTRJ.Latitude.to_numpy() )
+        i = np.clip( np.searchsorted( t_trj, t ), 1, len(t_trj)-1 )
+        far = np.minimum( np.abs(t-t_trj[i-1]), np.abs(t_trj[i]-t) )>TIME_TOL
+        x,y = Transformer.from_crs( 'EPSG:4326', self.EPSG, always_xy=True ).transform( lon,lat )
+        idx = self.Assign( x,y )
+        idx[far] = -1
+        df = dfIMG.copy()
+        df['TILE'] = np.where( idx>=0, self.TILE.TILE.to_numpy()[idx], '' )
+        if IMG_DIR is not None:
+            for TILE,grp in df[df.TILE!=''].groupby( 'TILE' ):
+                IMG_DIR_TILE = Path(IMG_DIR) / TILE
+                IMG_DIR_TILE.mkdir( parents=True, exist_ok=True )
+                LOG.info( f'Copying {len(grp)} images to {IMG_DIR_TILE} ...' )
+                for FILE in grp.FILE:
+                    shutil.copy2( FILE, IMG_DIR_TILE )
+        return df
+
+###############################################################################
+if __name__=="__main__":
+    parser = argparse.ArgumentParser(
+            description="Partition LAS point clouds and images into the MMS tiles of MakeRoadSect.py" )
+    parser.add_argument("toml", help="TOML file of MakeRoadSect.py , its tiles in ./CACHE must exist" )
+    parser.add_argument("-r","--route", default=None, help="route name of the data, default all routes")
+    parser.add_argument("--las", nargs='+', default=[], help="LAS files of the route")
+    parser.add_argument("--src_epsg", default=None, help="CRS of the LAS points, default tile UTM, tiles written in tile UTM")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="points per read chunk")
+    parser.add_argument("--img", default=None, help="CSV of images : FILE,GPSTime")
+    parser.add_argument("--trj", default=None, help="CSV of trajectory : GPSTime,Latitude,Longitude")
+    args = parser.parse_args()
+
+    with open( args.toml ,'rb' ) as f:
+        TOML = pd.Series( tomllib.load(f) )
+    REP_DIR = f'./CACHE/{TOML.INSTRU}_{TOML.ACQ_DATE}'      # as MMS_Route.REP_DIR
+    dfROUTE,EPSG = ReadTiles( f'{REP_DIR}/PntCloud' )
+    part = TilePartition( dfROUTE, EPSG, ROUTE=args.route )
+    if len(args.las):
+        cnt = part.PartitionLAS( args.las, f'{REP_DIR}/PntCloud', CHUNK=args.chunk,
+                                 SRC_EPSG=args.src_epsg )
+        print( cnt[cnt>0].to_markdown() )
+    if args.img is not None:
+        assert( args.trj is not None ),'***ERROR*** --img needs --trj'
+        dfIMG = part.PartitionImages( pd.read_csv( args.img ), pd.read_csv( args.trj ),
+                                      IMG_DIR=f'{REP_DIR}/Images' )
+        print( dfIMG.TILE.value_counts().to_markdown() )
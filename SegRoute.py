@@ -0,0 +1,70 @@
+#
+# SegRoute.py : split a whole route centerline into tangent and arc segments
+#               from the heading change along a sliding window, so that each arc
+#               can be fitted by EstimateCurve without hand-cut features.
+#
+# Author : Phisan Santitamnont ( phisan.chula@gmail.com )
+#
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from shapely.ops import substring
+from Densify import InterpolateXY
+
+def RunLength( lab ):
+    ''' begin/end index and label of each run of equal labels '''
+    brk = np.flatnonzero( np.diff(lab) )+1
+    beg = np.concatenate( [ [0], brk ] )
+    end = np.concatenate( [ brk, [len(lab)] ] )
+    return beg,end,lab[beg]
+
+def SegmentRoute( LS, DIV=1.0, WINDOW=40., R_TANGENT=2500., MIN_LEN=15., MIN_DELTA=3.,
+                  MIN_ARC=None, CRS=None ):
+    ''' walk LS once at DIV m steps, curvature = heading change between the chords
+        WINDOW/2 m behind and ahead of each station ( smooths digitizing noise ).
+        |curvature| < 1/R_TANGENT is tangent, else arc turning left(+)/right(-).
+        Runs shorter than MIN_LEN take the label of their longer neighbour, arcs
+        turning less than MIN_DELTA degree or shorter than MIN_ARC m ( default
+        WINDOW , below the smoothing window a wiggle is not a curve ) are taken
+        as tangent.
+        return GeoDataFrame of segments : TYPE (TANGENT|ARC), TURN (L|R), REVERSE,
+               BEG_m, END_m, DELTA (signed heading change, radian), ROUND_ABOUT '''
+    LEN = LS.length
+    dist = np.append( np.arange( 0, LEN, DIV ), LEN )
+    xy = InterpolateXY( LS, dist )
+    n = len(dist)
+    w = max( 1, int(round( WINDOW/2/DIV )) )
+    i = np.arange( n )
+    lo,hi = np.clip( i-w, 0, n-1 ), np.clip( i+w, 0, n-1 )
+    hb = np.arctan2( xy[i,1]-xy[lo,1], xy[i,0]-xy[lo,0] )     # chord behind
+    hf = np.arctan2( xy[hi,1]-xy[i,1], xy[hi,0]-xy[i,0] )     # chord ahead
+    ok = (i-lo>=(w+1)//2) & (hi-i>=(w+1)//2)                 # at least half window
+    dh = np.where( ok, np.angle( np.exp( 1j*(hf-hb) ) ), 0. )
+    curv = np.divide( dh, (dist[hi]-dist[lo])/2, out=np.zeros_like(dh), where=ok )
+    lab = np.where( np.abs(curv)<1/R_TANGENT, 0, np.sign(curv) ).astype(int)
+    cumhead = np.concatenate( [ [0.], np.cumsum( curv[:-1]*np.diff(dist) ) ] )
+    #### absorb short runs into the longer neighbour , then re-encode
+    beg,end,rl = RunLength( lab )
+    seglen = dist[np.minimum(end,n-1)]-dist[beg]
+    for k in np.flatnonzero( seglen<MIN_LEN ):
+        prv = seglen[k-1] if k>0 else -1
+        nxt = seglen[k+1] if k<len(rl)-1 else -1
+        if max(prv,nxt)>0: rl[k] = rl[k-1] if prv>=nxt else rl[k+1]
+    beg,end,rl = RunLength( np.repeat( rl, end-beg ) )
+    delta = cumhead[np.minimum(end,n-1)]-cumhead[beg]
+    arclen = dist[np.minimum(end,n-1)]-dist[beg]
+    MIN_ARC = WINDOW if MIN_ARC is None else MIN_ARC
+    rl[ (np.abs(delta)<np.radians(MIN_DELTA)) | (arclen<MIN_ARC) ] = 0
+    beg,end,rl = RunLength( np.repeat( rl, end-beg ) )
+    end = np.minimum( end, n-1 )
+    #### segment table
+    df = pd.DataFrame( { 'TYPE': np.where( rl==0, 'TANGENT', 'ARC' ),
+                         'TURN': np.select( [rl>0,rl<0], ['L','R'], '' ),
+                         'BEG_m': dist[beg], 'END_m': dist[end],
+                         'DELTA': cumhead[end]-cumhead[beg] } )
+    df.loc[df.TYPE=='TANGENT','DELTA'] = 0.
+    nxt_rl = np.append( rl[1:], 0 ) ; prv_rl = np.insert( rl[:-1], 0, 0 )
+    df['REVERSE'] = ( rl*nxt_rl<0 ) | ( rl*prv_rl<0 )
+    df['ROUND_ABOUT'] = np.abs(df.DELTA)>np.pi
+    geom = [ substring( LS, b, e ) for b,e in zip(df.BEG_m,df.END_m) ]
+    return gpd.GeoDataFrame( df, crs=CRS, geometry=geom )
@@ -20,5 +20,5 @@ for def_ang in range(10, 360, 10 ):
     L2r = rotate( L2, def_ang, origin=PI, use_radians=False )
     ls = LineString( [ PC,PI, L2r.coords[1] ] )
     cc = CircularCurve( 32647, ls , 300, 20 )
-    cc.DoPlot(PLOT_FILE=f'{def_ang:03d}' )
+    cc.DoPlot(SUFFIX=f'{def_ang:03d}' )
     #import pdb ; pdb.set_trace()
@@ -3,15 +3,58 @@
 # CompareTrj : compare trajectories from an MMS resulting for various reference
 #              base stations from differenct distances 0 km .. 50 km
 #
+import numpy as np
 import pandas as pd
 import geopandas as gpd
 import shapely
-import pdal
 import json
-from pyproj import Geod
+import os
+import sys
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pyproj import Geod, Transformer
 from shapely.geometry import LineString
 from pyogrio import read_dataframe
 from pathlib import Path
+def _ImportInstrument():
+    ''' Instrument.py of the repo : on the path ( repo root on PYTHONPATH , or
+        imported as Trajectory.CompareTrj ) , else loaded from the parent folder
+        when run inside Trajectory/ , None if not found '''
+    import importlib.util
+    try:
+        import Instrument
+        return Instrument
+    except ImportError:
+        FILE = Path(__file__).resolve().parents[1] / 'Instrument.py'
+        if not FILE.exists(): return None
+        spec = importlib.util.spec_from_file_location( 'Instrument', FILE )
+        Instrument = importlib.util.module_from_spec( spec )
+        sys.modules['Instrument'] = Instrument
+        spec.loader.exec_module( Instrument )
+        return Instrument
+
+_INSTRUMENT = _ImportInstrument()
+if _INSTRUMENT is not None:
+    PROF, GetLogger, SetLogLevel = _INSTRUMENT.PROF, _INSTRUMENT.GetLogger, _INSTRUMENT.SetLogLevel
+else:                     # copied out of the repo : plain logging , no profiling
+    import logging
+    import contextlib
+    logging.basicConfig( format='%(message)s', stream=sys.stdout, level='INFO' )
+    def GetLogger( NAME ):
+        return logging.getLogger( NAME )
+    def SetLogLevel( LEVEL ):
+        logging.getLogger().setLevel( LEVEL.upper() )
+    class _NoProfiler:
+        ''' no-op stand-in of Instrument.PROF '''
+        def Enable( self, OUT='1' ):
+            logging.getLogger( 'CompareTrj' ).warning(
+                    '--profile needs Instrument.py of the repo next to Trajectory/' )
+        def Timer( self, STAGE ): return contextlib.nullcontext()
+        def Timed( self, func ): return func
+        def Count( self, STAGE, N=1 ): pass
+    PROF = _NoProfiler()
+
+LOG = GetLogger( 'CompareTrj' )
 
 DIST_KM = { 'BASE'    : [ 'GNSS01','GNSS02','SBKK','PKKT','BPLE','OKRK'], 
             'dist_km' : [     0,       0,      8,    20,    30,    47  ]  }
@@ -20,134 +63,375 @@ COLUMNS = ['GPSTime', 'GPSTime.1', 'Latitude', 'Longitude', 'H-Ell', 'Roll',
        'Pitch', 'Heading', 'SDEast', 'SDNorth', 'SDHeight', 'RollSD',
        'PitchSD', 'HdngSD', 'AmbStatus', 'Q']
 
+CORE = ['GPSTime','Latitude','Longitude','H-Ell']   # always read, after mapping
+
+# Applanix SBET : 17 little-endian doubles per epoch , names as PDAL readers.sbet
+SBET_DTYPE = np.dtype( [ (name,'<f8') for name in [ 'GpsTime','Y','X','Z',
+        'XVelocity','YVelocity','ZVelocity','Roll','Pitch','Azimuth','WanderAngle',
+        'XBodyAccel','YBodyAccel','ZBodyAccel','XBodyAngRate','YBodyAngRate','ZBodyAngRate' ] ] )
+SBET_ANGLE = [ 'Y','X','Roll','Pitch','Azimuth','WanderAngle',
+               'XBodyAngRate','YBodyAngRate','ZBodyAngRate' ]   # radian in file
+
 class CmpTrajectory:
-    def __init__(self, SYS):
+    SPEEDS = [30,60]   # kmh
+    MAPPING = {}       # raw column -> normalized name , per format
+    STEP = 1           # decimation of the epochs read
+    def __init__(self, SYS, PIPELINE=False):
+        ''' PIPELINE=True reads nothing here, see DoComparePool() '''
         self.SYS = SYS
+        self.TIME_WIN = SYS.get( 'TIME_WIN' )   # [t0,t1] GPSTime or None
+        self.COLUMNS  = SYS.get( 'COLUMNS' )    # extra columns beside CORE, None = all
+        self.CHUNK    = SYS.get( 'CHUNK', 100_000 )  # rows per read chunk
+        self.TRJ_CACHE = SYS.get( 'TRJ_CACHE', True )  # ./CACHE/TrjCache of parsed files
+        self.TIME_TOL = SYS.get( 'TIME_TOL', 1.0 )     # sec, see AlignByTime()
+        if SYS.get( 'STEP' ): self.STEP = SYS.STEP      # decimation other than per format
         self.CACHE = Path('./CACHE')
         self.CACHE.mkdir( parents=True, exist_ok=True)
         self.PLOT = self.CACHE / f'COMPARE_{SYS.INSTRU}.gpkg'
+        if PIPELINE: return
         trj = list()
-        for Speed in [30,60]: # kmh
+        for Speed in self.SPEEDS:
             for Base in SYS.BASE:    
-                FILE = self.TRJ.format( **{'Instru':SYS.INSTRU, 'Speed':Speed, 'Base':Base } )
-                df = self.ReadTrj( FILE ) 
-                #import pdb; pdb.set_trace()
-                #df[['INSTRU','SPEED','BASE']]=[SYS.INSTRU,Speed,Base]
-                df['INSTRU']=SYS.INSTRU  ; df['SPEED']=Speed;  df['BASE']=Base
-                trj.append( df )
+                trj.append( self.ReadGroup( Speed, Base ) )
         self.dfTRJ = pd.concat( trj )
 
-    def CalcAccuDist(self, df ):
-        g = Geod( ellps='WGS84')
-        dist_m = list() 
-        for i in range( len(df) ):
-            if i==0: 
-                acc_dist = 0.0
+    def ReadGroup( self, Speed, Base ):
+        FILE = self.TRJ.format( **{'Instru':self.SYS.INSTRU, 'Speed':Speed, 'Base':Base } )
+        df = self.ReadTrj( FILE ) 
+        #import pdb; pdb.set_trace()
+        #df[['INSTRU','SPEED','BASE']]=[SYS.INSTRU,Speed,Base]
+        df['INSTRU']=self.SYS.INSTRU  ; df['SPEED']=Speed;  df['BASE']=Base
+        return df
+
+    def KeepCols( self, MAPPING={} ):
+        ''' raw column names to be read , None = all '''
+        if self.COLUMNS is None: return None
+        inverse = { v:k for k,v in MAPPING.items() }
+        return [ inverse.get(col,col) for col in CORE+list(self.COLUMNS) ]
+
+    @PROF.Timed
+    def ReadTrj( self, TRJFILE ):
+        ''' normalized trajectory of TRJFILE ( MAPPING applied ) , every STEP-th
+            epoch within TIME_WIN , from the columnar cache if TRJ_CACHE '''
+        LOG.info( f'Reading {TRJFILE} ...' )
+        if self.TRJ_CACHE:
+            df = self.ReadCache( TRJFILE )
+        else:
+            df = self.ReadChunks( self.IterTrj( TRJFILE, self.KeepCols( self.MAPPING ) ) )
+        LOG.info( f'Epochs : {len(df):,} ...' )
+        LOG.debug( f'Columns : {len(df.columns)} ...' )
+        PROF.Count( 'CmpTrajectory.epochs_read', len(df) )
+        return df
+
+    def ReadChunks( self, CHUNKS ):
+        ''' concatenate reader CHUNKS keeping every STEP-th row of the whole file
+            ( same as iloc[::STEP] ) within TIME_WIN , only kept rows are held '''
+        kept = list() ; row0 = 0
+        for df in CHUNKS:
+            nrow = len(df)
+            df = df.iloc[ (-row0)%self.STEP::self.STEP ]
+            row0 += nrow
+            if self.TIME_WIN is not None:
+                df = df[ df.GPSTime.between( *self.TIME_WIN ) ]
+            kept.append( df )
+        return pd.concat( kept )
+
+    def CacheFile( self, TRJFILE ):
+        ''' cache file of TRJFILE and the key it must carry : source path, size, mtime '''
+        SRC = Path( TRJFILE ).resolve()
+        st = SRC.stat()
+        READER = type(self).__name__ + ( '_PDAL' if self.SYS.get( 'SBET_PDAL', False ) else '' )
+        KEY = { 'source': str(SRC), 'size': str(st.st_size),
+                'mtime_ns': str(st.st_mtime_ns), 'reader': READER }
+        name = hashlib.sha1( f'{SRC}|{READER}'.encode() ).hexdigest()[:20]
+        return self.CACHE / 'TrjCache' / f'{name}.feather', KEY
+
+    def ReadCache( self, TRJFILE ):
+        ''' memory-map the Arrow IPC ( Feather v2 ) cache of TRJFILE , written by
+            one streaming pass of IterTrj() when missing or stale , then take every
+            STEP-th epoch , TIME_WIN and the kept columns from the map '''
+        import pyarrow as pa
+        FEA,KEY = self.CacheFile( TRJFILE )
+        tbl = None
+        if FEA.exists():
+            tbl = pa.ipc.open_file( pa.memory_map( str(FEA) ) ).read_all()
+            meta = { k.decode():v.decode() for k,v in tbl.schema.metadata.items() }
+            if any( meta.get(k)!=v for k,v in KEY.items() ): tbl = None   # source changed
+        if tbl is None:
+            LOG.info( f'Caching {FEA} ...' )
+            self.WriteCache( TRJFILE, FEA, KEY )
+            tbl = pa.ipc.open_file( pa.memory_map( str(FEA) ) ).read_all()
+        idx = np.arange( 0, tbl.num_rows, self.STEP )
+        if self.TIME_WIN is not None:
+            t = tbl.column( 'GPSTime' ).to_numpy()[idx]
+            idx = idx[ (t>=self.TIME_WIN[0]) & (t<=self.TIME_WIN[1]) ]
+        if self.COLUMNS is not None:
+            tbl = tbl.select( [ col for col in tbl.column_names if col in CORE+list(self.COLUMNS) ] )
+        df = tbl.take( idx ).to_pandas()
+        df.index = idx
+        return df
+
+    def WriteCache( self, TRJFILE, FEA, KEY ):
+        ''' all epochs and columns of TRJFILE chunk by chunk into FEA , KEY in the
+            schema metadata , renamed into place when complete '''
+        import pyarrow as pa
+        FEA.parent.mkdir( parents=True, exist_ok=True )
+        TMP = FEA.with_suffix( '.tmp' )
+        writer = None
+        try:
+            for df in self.IterTrj( TRJFILE, None ):
+                if writer is None:
+                    schema = pa.Schema.from_pandas( df, preserve_index=False )
+                    schema = schema.with_metadata( { **schema.metadata, **KEY } )
+                    writer = pa.ipc.new_file( str(TMP), schema )
+                writer.write_batch( pa.RecordBatch.from_pandas( df, schema=schema,
+                                                                preserve_index=False ) )
+        except BaseException:
+            if writer is not None: writer.close()
+            TMP.unlink( missing_ok=True )         # no partial cache left behind
+            raise
+        if writer is not None: writer.close()
+        os.replace( TMP, FEA )
+
+    def CalcAccuDist(self, df, UTM=None, APPEND=False ):
+        ''' accumulated distance along track into df['dist_m'], geodesic WGS84 steps
+            in one array call of Geod.inv, or planar steps in projected CRS UTM.
+            APPEND=True continues after the last epoch having dist_m ( new epochs
+            appended at the end ) instead of recomputing the whole track '''
+        lon = df.Longitude.to_numpy() ; lat = df.Latitude.to_numpy()
+        dist_m = np.zeros( len(df) ) ; k = 0
+        if APPEND and 'dist_m' in df:
+            dist_m = df.dist_m.to_numpy( dtype=float, copy=True )
+            done = ~np.isnan( dist_m )
+            k = len(df) if done.all() else int(np.argmin(done))    # first new epoch
+        beg = max( k,1 )
+        if beg<len(df):
+            if UTM is None:
+                _,_,step = Geod( ellps='WGS84').inv( lon[beg-1:-1], lat[beg-1:-1],
+                                                     lon[beg:], lat[beg:] )
             else:
-                _,_,dist  = g.inv( df.iloc[i-1].Longitude, df.iloc[i-1].Latitude,
-                                   df.iloc[i  ].Longitude, df.iloc[i  ].Latitude  ) 
-                acc_dist += dist
-            dist_m.append( acc_dist )
+                E,N = Transformer.from_crs( 'EPSG:4326', UTM, always_xy=True ).transform(
+                                                     lon[beg-1:], lat[beg-1:] )
+                step = np.hypot( np.diff(E), np.diff(N) )
+            dist_m[0] = 0. if k==0 else dist_m[0]
+            dist_m[beg:] = dist_m[beg-1] + np.cumsum( step )
         df['dist_m'] = dist_m
 
-    def MakeRefTrajectory( self, SPEED ):
-        print( f'-----> MakeRefTrajectory( {SPEED}) ...')
-        self.dfREF = self.dfTRJ[ (self.dfTRJ.SPEED==SPEED) & (self.dfTRJ.BASE==self.SYS.BASE[0])].copy()
-        #self.CalcAccuDist( self.dfREF )
+    @PROF.Timed
+    def MakeRefTrajectory( self, SPEED, dfREF=None ):
+        LOG.info( f'-----> MakeRefTrajectory( {SPEED}) ...')
+        if dfREF is None:
+            dfREF = self.dfTRJ[ (self.dfTRJ.SPEED==SPEED) & (self.dfTRJ.BASE==self.SYS.BASE[0])]
+        self.dfREF = dfREF.copy()
+        self.CalcAccuDist( self.dfREF )
+        self.dfREF.sort_values( by='GPSTime', inplace=True )   # MakeDiff() matches by time
         self.dfREF.reset_index( drop=True, inplace=True )
         LS = LineString( self.dfREF[['Longitude','Latitude']].to_numpy() )
         self.gdfRefLS = gpd.GeoDataFrame( crs='EPSG:4326', geometry=[ LS, ] )
-        print( f'Plotting reference trajectory speed={SPEED}kmh ...')
+        #### reference in UTM ( true metres ) , portable to pool workers as WKB
+        UTM = self.gdfRefLS.estimate_utm_crs()
+        E,N = Transformer.from_crs( 'EPSG:4326', UTM, always_xy=True ).transform(
+                    self.dfREF.Longitude.to_numpy(), self.dfREF.Latitude.to_numpy() )
+        self.REF = { 'UTM': UTM.to_wkt(),
+                     'WKB': shapely.to_wkb( LineString( np.column_stack( [E,N] ) ) ),
+                     'GPSTime': self.dfREF.GPSTime.to_numpy(),
+                     'H-Ell': self.dfREF['H-Ell'].to_numpy() }
+        self.UseReference( self.REF, self.dfREF )
+        LOG.info( f'Plotting reference trajectory speed={SPEED}kmh ...')
         self.gdfRefLS.to_file( self.PLOT , driver='GPKG' , layer=f'RefTraj_{SPEED}kmh' )
 
+    def UseReference( self, REF, dfREF=None ):
+        ''' segments of the reference REF ( from MakeRefTrajectory ) indexed by STRtree '''
+        self.UTM = REF['UTM']
+        self.ToUTM = Transformer.from_crs( 'EPSG:4326', self.UTM, always_xy=True )
+        xy = shapely.get_coordinates( shapely.from_wkb( REF['WKB'] ) )
+        self.RefXY = xy                              # epochs in GPSTime order
+        self.RefSeg = shapely.linestrings( np.stack( [ xy[:-1], xy[1:] ], axis=1 ) )
+        self.RefTree = shapely.STRtree( self.RefSeg )
+        if dfREF is None:
+            dfREF = pd.DataFrame( { 'GPSTime': REF['GPSTime'], 'H-Ell': REF['H-Ell'] } )
+        self.dfREF = dfREF
+
+    @PROF.Timed
+    def CompareGroup( self, spd, base, grp ):
+        ''' differences of one (speed,base) group to the current reference ,
+            return one row of statistics and the GeoDataFrame of epochs '''
+        gdf = gpd.GeoDataFrame( grp , crs='EPSG:4326', 
+                  geometry=gpd.points_from_xy(grp.Longitude,grp.Latitude ) )
+        self.CalcAccuDist( gdf )
+        gdf.reset_index( drop=True, inplace=True )
+        self.MakeDiff( gdf )
+        cols = ['SPEED','BASE','hor_mean', 'hor_std', 'hor_max', 'ver_mean','ver_std','ver_max']
+        data = [spd,base] + gdf.HorDiff.describe()[['mean','std','max']].to_list() +\
+                            gdf.VerDiff.describe()[['mean','std','max']].to_list()
+        return pd.DataFrame( [data], columns=cols ), gdf
+
+    def Summary( self, diffs ):
+        self.dfDIFF = pd.concat( diffs )
+        self.dfDIFF = self.dfDIFF.merge( pd.DataFrame( DIST_KM ), on='BASE' )
+        self.dfDIFF = self.dfDIFF.sort_values( by=['SPEED','dist_km'], ascending=True )
+
     def DoCompare(self):
         VC = self.dfTRJ[['SPEED','BASE']].value_counts()
-        print( VC )
+        LOG.info( VC )
         diffs = list()
         for spd,spd_grp in self.dfTRJ.groupby('SPEED'):
             self.MakeRefTrajectory(spd)
             for base,base_grp in spd_grp.groupby('BASE'):
-                gdf = gpd.GeoDataFrame( base_grp , crs='EPSG:4326', 
-                          geometry=gpd.points_from_xy(base_grp.Longitude,base_grp.Latitude ) )
-                #self.CalcAccuDist( gdf )
-                gdf.reset_index( drop=True, inplace=True )
-                self.MakeDiff( gdf )
-                cols = ['SPEED','BASE','hor_mean', 'hor_std', 'hor_max', 'ver_mean','ver_std','ver_max']
-                data = [spd,base] + gdf.HorDiff.describe()[['mean','std','max']].to_list() +\
-                                    gdf.VerDiff.describe()[['mean','std','max']].to_list()
-                df_diff = pd.DataFrame( [data], columns=cols )
+                df_diff,gdf = self.CompareGroup( spd, base, base_grp )
                 diffs.append( df_diff )
-                print(f'Plotting {self.PLOT} v={spd}kmh base={base}...' )
+                LOG.info(f'Plotting {self.PLOT} v={spd}kmh base={base}...' )
                 gdf.to_file( self.PLOT , driver='GPKG' , layer=f'v{spd}_{base}' ) 
-        self.dfDIFF = pd.concat( diffs )
-        self.dfDIFF = self.dfDIFF.merge( pd.DataFrame( DIST_KM ), on='BASE' )
-        self.dfDIFF = self.dfDIFF.sort_values( by=['SPEED','dist_km'], ascending=True )
+        self.Summary( diffs )
         #import pdb; pdb.set_trace()
+
+    def DoComparePool( self, WORKERS=None ):
+        ''' pipeline mode ( instance made with PIPELINE=True ) : per speed the
+            reference is read and built here once and handed to each worker process
+            as WKB at start-up , workers read and compare one (speed,base) each .
+            Statistics are collected as groups complete , each group is written
+            to its layer and dropped , no dfTRJ of all trajectories is held '''
+        diffs = list()
+        for spd in self.SPEEDS:
+            self.MakeRefTrajectory( spd, self.ReadGroup( spd, self.SYS.BASE[0] ) )
+            jobs = [ ( type(self), self.SYS, spd, base ) for base in self.SYS.BASE ]
+            with ProcessPoolExecutor( max_workers=WORKERS, initializer=_InitWorker,
+                                      initargs=(self.REF,) ) as pool:
+                futs = [ pool.submit( _CompareWorker, job ) for job in jobs ]
+                done = dict()
+                for fut in as_completed( futs ):
+                    df_diff,gdf = fut.result()
+                    base = df_diff.BASE.iloc[0]
+                    done[base] = df_diff
+                    LOG.info(f'Plotting {self.PLOT} v={spd}kmh base={base}...' )
+                    gdf.to_file( self.PLOT , driver='GPKG' , layer=f'v{spd}_{base}' ) 
+                    del gdf
+            diffs += [ done[base] for base in sorted(done) ]   # as DoCompare() groupby
+        self.Summary( diffs )
     
+    def AlignByTime( self, t ):
+        ''' reference at test epochs GPSTime t : linear interpolation between the
+            bracketing epochs of the time-sorted reference ( searchsorted ) , nan
+            where the nearest reference epoch is more than TIME_TOL away ( gaps ,
+            before/after the reference ) . return E,N (UTM), H-Ell of the reference '''
+        t = np.asarray( t, dtype=float )
+        t_ref = self.dfREF.GPSTime.to_numpy()
+        i = np.clip( np.searchsorted( t_ref, t ), 1, len(t_ref)-1 )
+        t0,t1 = t_ref[i-1], t_ref[i]
+        w = np.clip( np.divide( t-t0, t1-t0, out=np.zeros_like(t), where=t1>t0 ), 0., 1. )
+        far = np.minimum( np.abs(t-t0), np.abs(t1-t) )>self.TIME_TOL
+        def lerp( v ):
+            v = v[i-1] + w*( v[i]-v[i-1] )
+            v[far] = np.nan
+            return v
+        return lerp( self.RefXY[:,0] ), lerp( self.RefXY[:,1] ), lerp( self.dfREF['H-Ell'].to_numpy() )
+
+    @PROF.Timed
     def MakeDiff(self, gdf ):
-        def _MakeDiff(row, RefLS, RefTrj):
-            lsdist = RefLS.project( row.geometry, normalized=False )
-            pnt = RefLS.interpolate( lsdist, normalized=False )
-            hor_diff = 111_000*shapely.distance( pnt, row.geometry ) 
-            ver_diff = row['H-Ell'] - RefTrj.iloc[ row.name ]['H-Ell']
-            #import pdb; pdb.set_trace()
-            return hor_diff,ver_diff
+        ''' HorDiff : UTM distance to the nearest reference segment ( STRtree ),
+            VerDiff : H-Ell minus reference H-Ell at the same GPSTime ,
+            SyncDiff : UTM distance to the reference position at the same GPSTime ,
+            nan if not within TIME_TOL of the reference , see AlignByTime() '''
         if 1:  
-            LS = self.gdfRefLS.iloc[0].geometry 
-            gdf[['HorDiff','VerDiff']] = gdf.apply( _MakeDiff, axis=1,
-                                        result_type='expand', args=(LS,self.dfREF) )
+            E,N = self.ToUTM.transform( gdf.Longitude.to_numpy(), gdf.Latitude.to_numpy() )
+            pnts = shapely.points( E,N )
+            i_pnt,i_seg = self.RefTree.query_nearest( pnts, all_matches=False )
+            hor_diff = np.empty( len(gdf) )
+            hor_diff[i_pnt] = shapely.distance( pnts[i_pnt], self.RefSeg[i_seg] )
+            E_ref,N_ref,H_ref = self.AlignByTime( gdf.GPSTime.to_numpy() )
+            gdf['HorDiff'] = hor_diff
+            gdf['VerDiff'] = gdf['H-Ell'].to_numpy() - H_ref
+            gdf['SyncDiff'] = np.hypot( E-E_ref, N-N_ref )
+            PROF.Count( 'CmpTrajectory.epochs_diffed', len(gdf) )
         else:
-            print( f'***DEBUG*** MakeDiff(self, gdf )')
+            LOG.debug( f'***DEBUG*** MakeDiff(self, gdf )')
             gdf[['HorDiff','VerDiff']] = 1.0,1.0  # debug !!!
             import pdb; pdb.set_trace()
 
+#######################################################################################
+_WORKER_REF = None   # reference of the current speed in a DoComparePool() worker
+
+def _InitWorker( REF ):
+    global _WORKER_REF
+    _WORKER_REF = REF
+
+def _CompareWorker( job ):
+    CLS,SYS,spd,base = job
+    cmp = CLS( SYS, PIPELINE=True )
+    cmp.UseReference( _WORKER_REF )
+    return cmp.CompareGroup( spd, base, cmp.ReadGroup( spd, base ) )
+
 #######################################################################################
 class TrajectoryAU20( CmpTrajectory ):
-    def __init__( self, SYS ):
+    def __init__( self, SYS, **kw ):
         self.TRJ = './Trajectory_POC_MLS/{Instru}/Speed_{Speed:}/{Base:}/trajectory.csv'
-        super().__init__( SYS )
+        super().__init__( SYS, **kw )
 
-    def ReadTrj( self, TRJFILE ):
-        print( f'Reading {TRJFILE} ...' )
-        df = pd.read_csv( TRJFILE, skiprows=[1,] )
-        print( f'Epochs : {len(df):,} ...' )
-        print( f'Columns : {len(df.columns)} ...' )
-        return df
+    def IterTrj( self, TRJFILE, KEEP ):
+        ''' chunks of trajectory.csv , integer/bool columns as float64 so that every
+            chunk has the dtypes of the first ( a gap is NaN ) for WriteCache() '''
+        chunks = pd.read_csv( TRJFILE, skiprows=[1,], chunksize=self.CHUNK,
+                    usecols=None if KEEP is None else lambda col: col in KEEP,
+                    dtype={ col:np.float64 for col in CORE } )
+        for df in chunks:
+            yield df.astype( { col:np.float64 for col,dt in df.dtypes.items()
+                               if pd.api.types.is_integer_dtype(dt) or pd.api.types.is_bool_dtype(dt) } )
 
 #######################################################################################
 class TrajectoryMX9( CmpTrajectory ):
-    def __init__( self, SYS ):
+    MAPPING = { 'TIME': 'GPSTime','LATITUDE':'Latitude','LONGITUDE':'Longitude',
+                'ELLIPSOID HEIGHT':  'H-Ell' }
+    STEP = 32   # sampling
+    def __init__( self, SYS, **kw ):
         self.TRJ = './Trajectory_POC_MLS/{Instru}/Speed_{Speed:}/{Base:}/Speed_{Speed:}_{Base:}.csv'
-        super().__init__( SYS )
+        super().__init__( SYS, **kw )
 
-    def ReadTrj( self, TRJFILE ):
+    def IterTrj( self, TRJFILE, KEEP ):
         HDR = " TIME, DISTANCE, EASTING, NORTHING, ELLIPSOID HEIGHT, LATITUDE, LONGITUDE, ELLIPSOID HEIGHT, ROLL, PITCH, HEADING, EAST VELOCITY, NORTH VELOCITY, UP VELOCITY, EAST SD, NORTH SD, HEIGHT SD, ROLL SD, PITCH SD, HEADING SD"
         HDR = [item.strip() for item in HDR.split(',')]
-        print( f'Reading {TRJFILE} ...' )
+        usecols = [ i for i,col in enumerate(HDR) if col not in HDR[:i] and
+                                        (KEEP is None or col in KEEP) ]  # first of duplicates
+        kw = dict( skiprows=28, header=None, usecols=usecols, chunksize=self.CHUNK,
+                   names=list(range(len(HDR))), dtype=np.float64 )
         if TRJFILE[-17:]=='Speed_30_BPLE.csv':  # mistake !!!
-            df = pd.read_csv( TRJFILE, skiprows=28, header=None )
+            chunks = pd.read_csv( TRJFILE, **kw )
         else:
-            df = pd.read_fwf( TRJFILE, skiprows=28, header=None )
-        df.columns = HDR
+            chunks = pd.read_fwf( TRJFILE, **kw )
         #import pdb; pdb.set_trace()
-        duplicate_columns = df.columns.duplicated()
-        df = df.loc[:,~duplicate_columns]
-        df = df.iloc[::32]  # sampling
-        mapping = { 'TIME': 'GPSTime','LATITUDE':'Latitude','LONGITUDE':'Longitude',
-                    'ELLIPSOID HEIGHT':  'H-Ell' }
-        df.rename( columns=mapping , inplace=True )
-        print( f'Epochs : {len(df):,} ...' )
-        print( f'Columns : {len(df.columns)} ...' )
-        return df
+        return ( df.set_axis( [HDR[i] for i in df.columns], axis=1 ).rename( columns=self.MAPPING )
+                 for df in chunks )
 
 #######################################################################################
 class TrajectoryM2X( CmpTrajectory):
-    def __init__( self, SYS):
+    MAPPING = { 'GpsTime': 'GPSTime','Y':  'Latitude','X': 'Longitude','Z':'H-Ell' }
+    STEP = 16   # sampling
+    def __init__( self, SYS, **kw ):
         self.TRJ = './Trajectory_POC_MLS/{Instru}/trjspeed{Speed:}_{Base:}/SBET_GTGV0M0.OUT'
-        super().__init__( SYS )
+        super().__init__( SYS, **kw )
 
-    def ReadTrj( self, TRJFILE ):
-        print( f'Reading {TRJFILE} ...' )
+    def IterTrj( self, TRJFILE, KEEP ):
+        if self.SYS.get( 'SBET_PDAL', False ):
+            chunks = [ self.ReadSBET_PDAL( TRJFILE ), ]
+        else:
+            chunks = self.IterSBET( TRJFILE, KEEP )
+        #import pdb; pdb.set_trace()
+        return ( df.rename( columns=self.MAPPING ) for df in chunks )
+
+    def IterSBET( self, TRJFILE, KEEP=None ):
+        ''' memory-mapped SBET , CHUNK epochs at a time copying only the kept
+            fields , angles in degree as PDAL '''
+        sbet = np.memmap( TRJFILE, dtype=SBET_DTYPE, mode='r' )
+        names = SBET_DTYPE.names if KEEP is None else [n for n in SBET_DTYPE.names if n in KEEP]
+        for beg in range( 0, len(sbet), self.CHUNK ):
+            blk = sbet[beg:beg+self.CHUNK]
+            df = pd.DataFrame( { n: np.array( blk[n] ) for n in names },
+                               index=pd.RangeIndex( beg, beg+len(blk) ) )
+            for n in set(names) & set(SBET_ANGLE): df[n] = np.degrees( df[n] )
+            yield df
+        del sbet
+
+    def ReadSBET_PDAL( self, TRJFILE ):
+        import pdal
         pipeline = { "pipeline": [ { "type": "readers.sbet", "filename": TRJFILE } ] }
         pipeline = pdal.Pipeline(json.dumps(pipeline))
         try:
@@ -155,14 +439,7 @@ class TrajectoryM2X( CmpTrajectory):
         except:
             import pdb; pdb.set_trace()
         arrays = pipeline.arrays[0]
-        df = pd.DataFrame(arrays)
-        print( f'Epochs : {len(df):,} ...' )
-        print( f'Columns : {len(df.columns)} ...' )
-        mapping = { 'GpsTime': 'GPSTime','Y':  'Latitude','X': 'Longitude','Z':'H-Ell' }
-        df.rename( columns=mapping , inplace=True )
-        #import pdb; pdb.set_trace()
-        df = df.iloc[::16].copy()
-        return df
+        return pd.DataFrame(arrays)
 
 #############################################################################
 #############################################################################
@@ -176,33 +453,49 @@ SYS_MX9 = pd.Series( { 'INSTRU' : 'MX9',   #   MX9
 SYS_M2X = pd.Series( { 'INSTRU' : 'ScoutM2X',   #  M2X
            'BASE' : ['GNSS01','SBKK', 'BPLE','OKRK'] } )   # PKKT error!
 
-import argparse
-parser = argparse.ArgumentParser( description=\
-        'read trajectories in varios formats and compare with i'\
-        'the slowest speed and nearest base reference station')
-parser.add_argument("--au20",action="store_true", help="CHC AU20")
-parser.add_argument("--mx9", action="store_true", help="Trimble MX9")
-parser.add_argument("--m2x", action="store_true", help="Phoenix M2X")
-args = parser.parse_args()
-print( args )
-if set(vars(args).values())==set([False,]):
-    parser.print_help()
-#import pdb ; pdb.set_trace()
-
-if args.au20:
-    cmp = TrajectoryAU20( SYS_AU20 )
-    cmp.DoCompare()
-    print(cmp.dfDIFF.to_markdown( floatfmt='.3f' ))
-if args.mx9:
-    cmp = TrajectoryMX9( SYS_MX9 )
-    cmp.DoCompare()
-    print(cmp.dfDIFF.to_markdown( floatfmt='.3f' ))
-if args.m2x:  
-    cmp = TrajectoryM2X( SYS_M2X )
-    cmp.DoCompare( )
-    print(cmp.dfDIFF.to_markdown( floatfmt='.3f' ))
-
-
-
-
+if __name__=="__main__":
+    import argparse
+    parser = argparse.ArgumentParser( description=\
+            'read trajectories in varios formats and compare with i'\
+            'the slowest speed and nearest base reference station')
+    parser.add_argument("--au20",action="store_true", help="CHC AU20")
+    parser.add_argument("--mx9", action="store_true", help="Trimble MX9")
+    parser.add_argument("--m2x", action="store_true", help="Phoenix M2X")
+    parser.add_argument("--time_win", type=float, nargs=2, metavar=('T0','T1'),
+                        help="read only epochs of GPSTime within [T0,T1]")
+    parser.add_argument("--chunk", type=int, default=100_000, help="rows per read chunk")
+    parser.add_argument("--step", type=int, default=None,
+                        help="keep every STEP-th epoch, default per format AU20:1 MX9:32 M2X:16")
+    parser.add_argument("--time_tol", type=float, default=1.0,
+                        help="sec, max. gap to the reference epochs for time-synchronized differences")
+    parser.add_argument("--no_cache", action="store_true",
+                        help="parse the raw files , do not use ./CACHE/TrjCache")
+    parser.add_argument("-p","--pool", action="store_true",
+                        help="pipeline mode, read and compare each (speed,base) in a process pool")
+    parser.add_argument("-w","--workers", type=int, default=None,
+                        help="worker processes of --pool, default all CPUs")
+    parser.add_argument("--profile", nargs='?', const='1', default=None,
+                        help="stage timings, summary on exit, or JSON lines into PROFILE file")
+    parser.add_argument("--log", default=None, help="log level DEBUG|INFO|WARNING")
+    args = parser.parse_args()
+    if args.log: SetLogLevel( args.log )
+    if args.profile: PROF.Enable( args.profile )
+    LOG.debug( args )
+    for SYS in [SYS_AU20,SYS_MX9,SYS_M2X]:
+        SYS['TIME_WIN'] = args.time_win ; SYS['CHUNK'] = args.chunk
+        SYS['TRJ_CACHE'] = not args.no_cache
+        SYS['STEP'] = args.step ; SYS['TIME_TOL'] = args.time_tol
+    if not ( args.au20 or args.mx9 or args.m2x ):
+        parser.print_help()
+    #import pdb ; pdb.set_trace()
 
+    for FLAG,CLS,SYS in [ (args.au20,TrajectoryAU20,SYS_AU20), (args.mx9,TrajectoryMX9,SYS_MX9),
+                          (args.m2x,TrajectoryM2X,SYS_M2X) ]:
+        if not FLAG: continue
+        if args.pool:
+            cmp = CLS( SYS, PIPELINE=True )
+            cmp.DoComparePool( WORKERS=args.workers )
+        else:
+            cmp = CLS( SYS )
+            cmp.DoCompare()
+        print(cmp.dfDIFF.to_markdown( floatfmt='.3f' ))